@@ -1,5 +1,5 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query, UploadFile, Request
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import shutil
 import os
@@ -27,11 +27,33 @@ import io
 import os
 import logging
 import warnings
-from typing import Optional
+from typing import Callable, Optional
 import time
 import hashlib
+import threading
 from oct_converter.dicom.fda_meta import fda_dicom_metadata
 from riv_desktop.s3_api import bucket_name, s3
+from riv_desktop import jobs
+from riv_desktop.jobs import JobManager, JobQueueFull
+from riv_desktop.frame_encoder import (FRAME_FORMATS, JPEG_QUALITY, PREVIEW_MAX_SIDE, PREVIEW_QUALITY, encode_frame,
+                                       encode_frames, encode_pixels, encode_variant, negotiate_format, priority_order)
+from riv_desktop.frame_cache import EncodedFrameCache
+from riv_desktop.windowing import apply_window, auto_window, window_bounds
+from riv_desktop.encapsulated import JPEG_BASELINE, EncapsulatedFrameSource
+from riv_desktop.cache_index import CacheIndex
+from riv_desktop.cache_stats import summarize
+from riv_desktop.cache_writer import WriteBehindQueue
+from riv_desktop.derived_cache import ALGORITHM_VERSIONS, DERIVED_FILE_TYPE, DerivedArtifactCache
+from riv_desktop.http_cache import IMMUTABLE, cache_headers, is_not_modified, strong_etag
+from riv_desktop.frame_bundle import BUNDLE_MEDIA_TYPE, pack_bundle, pack_multipart, parse_frame_list
+from riv_desktop.volume_stream import choose_encoding, encode_stream, iter_volume, parse_range
+from riv_desktop.memory_cache import MemoryFrameStore, entry_nbytes
+from riv_desktop.disk_cache import (DiskCacheJanitor, FrameContainer, container_path, remove_entry, touch_entry,
+                                    write_container)
+from riv_desktop.fingerprint import copy_with_fingerprint, fingerprint_bytes, fingerprint_file, fingerprint_text
+from riv_desktop.decoders import (DecoderRegistry, decode_decompress, decode_default, decode_gdcm,
+                                  decode_pylibjpeg)
+from starlette.concurrency import run_in_threadpool
 import tempfile
 
 # Enhanced OCT flattening imports
@@ -72,8 +94,10 @@ app = FastAPI()
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Memory cache for storing processed images - MUST be defined before importing s3_api
-stored_images = {}
+# Memory cache for storing processed images - MUST be defined before importing s3_api.
+# Bounded by MEMORY_CACHE_MB; evicted entries are reloaded from the disk cache on demand.
+MEMORY_CACHE_MB = int(os.getenv("MEMORY_CACHE_MB", 2048))
+stored_images = MemoryFrameStore(max_bytes=MEMORY_CACHE_MB * 1024 * 1024)
 
 # S3 API Router - import after defining stored_images
 from riv_desktop.s3_api import router as s3_router
@@ -108,26 +132,87 @@ async def test_backend():
 # Add these constants near the top of your file
 CACHE_DIR = Path("cache")
 CACHE_DIR.mkdir(exist_ok=True)
+CACHE_FILE_TYPES = ["dicom", "e2e", "fda", DERIVED_FILE_TYPE]
+
+# Disk cache budget - the janitor evicts least recently accessed entries once the
+# cache (or one file type) outgrows its budget. 0 disables a limit.
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 10240))
+CACHE_QUOTA_MB = {file_type: int(os.getenv(f"CACHE_QUOTA_{file_type.upper()}_MB", 0)) for file_type in CACHE_FILE_TYPES}
+CACHE_MAX_AGE_DAYS = int(os.getenv("CACHE_MAX_AGE_DAYS", 7))
+CACHE_JANITOR_INTERVAL = int(os.getenv("CACHE_JANITOR_INTERVAL", 300))
+# fingerprint -> location/size/access times, shared by the API process and ingest workers
+CACHE_INDEX = CacheIndex(CACHE_DIR)
+# Running counters of the in-memory tier (stored_images); the disk tier's live in CACHE_INDEX
+MEMORY_STATS = stored_images.stats
+
+# Startup warm-up - preload the hottest disk cache entries ("recent" or "frequent") into memory
+CACHE_WARMUP_ENTRIES = int(os.getenv("CACHE_WARMUP_ENTRIES", 20))
+CACHE_WARMUP_BY = os.getenv("CACHE_WARMUP_BY", "recent")
+CACHE_WARMUP = {"status": "idle", "total": 0, "loaded": 0, "keys_restored": 0, "started_at": None, "finished_at": None}
+CACHE_JANITOR = DiskCacheJanitor(
+    CACHE_DIR,
+    CACHE_FILE_TYPES,
+    max_bytes=CACHE_MAX_MB * 1024 * 1024,
+    quotas={file_type: mb * 1024 * 1024 for file_type, mb in CACHE_QUOTA_MB.items()},
+    max_age_seconds=CACHE_MAX_AGE_DAYS * 24 * 3600,
+    interval=CACHE_JANITOR_INTERVAL,
+    index=CACHE_INDEX
+)
 
 # CRC-based caching system
 CRC_CACHE = {}  # In-memory CRC to file path mapping
 
-def calculate_crc32(file_path: str) -> str:
-    """Calculate CRC32 checksum of a file."""
+# Ingestion job system - file processing runs in a bounded process pool so the
+# event loop keeps serving frames while large volumes are decoded and encoded
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 64))
+# Job records are published to the cache index so every API worker can report them
+INGEST_JOBS = JobManager(max_workers=INGEST_WORKERS, max_pending=INGEST_MAX_PENDING, on_change=CACHE_INDEX.save_job)
+
+# Lazy frame rendering - ingest keeps only the windowed uint8 volume and frames
+# are JPEG-encoded the first time they are requested
+LAZY_FRAME_RENDERING = os.getenv("LAZY_FRAME_RENDERING", "false").lower() in ("1", "true", "yes")
+ENCODED_FRAME_CACHE = EncodedFrameCache(max_bytes=int(os.getenv("ENCODED_FRAME_CACHE_MB", 256)) * 1024 * 1024)
+
+# Interactive window/level - frames are re-rendered with a new contrast from the
+# raw (pre-window) volume. It is decoded from the entry's DICOM bytes the first
+# time it is needed; RETAIN_RAW_VOLUME keeps it from ingest instead (and is the
+# only way FDA entries, which have no DICOM bytes, can be re-rendered)
+RETAIN_RAW_VOLUME = os.getenv("RETAIN_RAW_VOLUME", "false").lower() in ("1", "true", "yes")
+RENDERED_FRAME_CACHE = EncodedFrameCache(max_bytes=int(os.getenv("RENDERED_FRAME_CACHE_MB", 128)) * 1024 * 1024)
+
+# Low-resolution previews (size=preview on the frame endpoints) are made from the
+# full-size frame on first request and kept in their own LRU
+FRAME_SIZES = ("full", "preview")
+PREVIEW_FRAME_CACHE = EncodedFrameCache(max_bytes=int(os.getenv("PREVIEW_FRAME_CACHE_MB", 64)) * 1024 * 1024)
+PREVIEW_SETTINGS = {"max_side": PREVIEW_MAX_SIDE, "quality": PREVIEW_QUALITY}
+
+# Frame formats - frames are stored as baseline JPEG; fmt=/q= select another format
+# or quality, re-encoded on first request and cached per variant. Negotiating from
+# the Accept header is opt-in: browsers list image/webp for every <img>, which
+# would re-encode each stored JPEG into a second-generation WebP
+FRAME_FORMAT_NEGOTIATION = os.getenv("FRAME_FORMAT_NEGOTIATION", "false").lower() in ("1", "true", "yes")
+FRAME_VARIANT_CACHE = EncodedFrameCache(max_bytes=int(os.getenv("FRAME_VARIANT_CACHE_MB", 128)) * 1024 * 1024)
+
+# Compressed multi-frame DICOM - decode frames one at a time on demand instead of the whole volume at ingest
+ENCAPSULATED_FRAME_DECODE = os.getenv("ENCAPSULATED_FRAME_DECODE", "true").lower() in ("1", "true", "yes")
+# Serve 8-bit greyscale JPEG Baseline frames as stored instead of decoding and re-encoding them
+JPEG_PASSTHROUGH = os.getenv("JPEG_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+# Settings that change the bytes served for a frame, so they are part of every frame ETag
+FRAME_ETAG_SETTINGS = {"quality": JPEG_QUALITY, "passthrough": JPEG_PASSTHROUGH}
+# Flattened and E2E images are requested without a version in the URL: browsers
+# keep them but revalidate, which the ETag answers with a 304
+REVALIDATE = "public, no-cache"
+# Most frames one /api/view_frames/{key}/batch request may ask for
+FRAME_BATCH_MAX = int(os.getenv("FRAME_BATCH_MAX", 256))
+
+def read_file_once(file_path: str) -> bytes:
+    """Read a file into one buffer that is reused for the CRC, DICOM parsing and the retained bytes."""
     with open(file_path, 'rb') as f:
-        buffer = f.read()
-        return format(zlib.crc32(buffer) & 0xFFFFFFFF, '08x')
-
-def calculate_content_crc32(content: bytes) -> str:
-    """Calculate CRC32 checksum of content bytes."""
-    return format(zlib.crc32(content) & 0xFFFFFFFF, '08x')
-
-def get_cache_path(crc: str) -> Path:
-    """Get the cache directory path for a given CRC."""
-    return CACHE_DIR / f"{crc}"
+        return f.read()
 
 def get_file_crc_from_metadata(file_path: str, metadata: dict = None) -> str:
-    """Generate CRC from file path and metadata for consistent caching."""
+    """Generate a cache key fingerprint from file path and metadata for consistent caching."""
     if metadata:
         # Include relevant metadata in CRC calculation
         crc_data = {
@@ -136,21 +221,20 @@ def get_file_crc_from_metadata(file_path: str, metadata: dict = None) -> str:
             'last_modified': metadata.get('last_modified', ''),
             'frame': metadata.get('frame', 0)
         }
-        content = json.dumps(crc_data, sort_keys=True).encode('utf-8')
-        return calculate_content_crc32(content)
+        return fingerprint_text(json.dumps(crc_data, sort_keys=True)).hexdigest()
     else:
-        # Fallback to path-based CRC
-        return calculate_content_crc32(file_path.encode('utf-8'))
+        # Fallback to path-based fingerprint
+        return fingerprint_text(file_path).hexdigest()
 
-def save_to_cache(crc: str, data: dict, file_type: str, file_info: dict):
-    """Enhanced save to cache with validation."""
+def save_to_cache(crc: str, data: dict, file_type: str, file_info: dict, source: Optional[bytes] = None,
+                  layout: Optional[dict] = None):
+    """
+    Save encoded frames, and the source file if given, to a packed cache
+    container for the CRC. layout, kept in the container metadata, tells how
+    to rebuild an entry whose frames are not stored as served (see
+    restored_entry).
+    """
     try:
-        # Determine cache directory based on file type
-        cache_dir = CACHE_DIR / file_type
-        cache_dir.mkdir(parents=True, exist_ok=True)  # Hierarchical directory structure
-        cache_path = cache_dir / crc  # CRC as the final directory name
-        cache_path.mkdir(exist_ok=True)
-
         # Validate data before saving
         if not data or len(data) == 0:
             logger.warning(f"No data to cache for CRC: {crc}")
@@ -160,135 +244,370 @@ def save_to_cache(crc: str, data: dict, file_type: str, file_info: dict):
         metadata = {
             "number_of_frames": len(data),
             "cached_at": time.time(),
-            "cache_version": "1.0",
+            "cache_version": "2.0",
             "crc": crc,
+            "file_type": file_type,
             "file_info": file_info
         }
+        if layout is not None:
+            metadata["layout"] = layout
 
-        with open(cache_path / "metadata.pkl", "wb") as f:
-            pickle.dump(metadata, f)
-
-        # Save individual frames
-        frames_saved = 0
+        frames = {}
         for frame_num, img_data in data.items():
             try:
-                frame_path = cache_path / f"frame_{frame_num}.jpg"
-                with open(frame_path, "wb") as f:
-                    img_data.seek(0)
-                    f.write(img_data.getvalue())
-                frames_saved += 1
+                frames[frame_num] = img_data.getvalue() if isinstance(img_data, io.BytesIO) else bytes(img_data)
             except Exception as e:
                 logger.error(f"Failed to save frame {frame_num}: {str(e)}")
 
-        logger.info(f"Successfully cached {frames_saved} frames for CRC: {crc}")
-        return frames_saved > 0
+        if len(frames) != len(data):
+            # A container must hold every frame, a partial one would be rejected on load
+            return False
+
+        path = container_path(CACHE_DIR, file_type, crc)
+        size = write_container(path, frames, metadata, source=source)
+        CACHE_INDEX.put(crc, file_type, path, frame_count=len(frames), size_bytes=size,
+                        source_size=file_info.get("size", 0), created_at=metadata["cached_at"])
+        logger.info(f"Successfully cached {len(frames)} frames ({size} bytes) for CRC: {crc}")
+        return True
 
     except Exception as e:
         logger.error(f"Failed to save cache for CRC {crc}: {str(e)}")
         return False
 
-def load_from_cache(crc: str) -> tuple[dict, dict]:
-    """Enhanced load from cache with validation."""
+# Keep each DICOM file in its disk cache entry, next to the encoded frames, so the
+# raw pixels (/api/volume, window/level renders) can be decoded again after a
+# restart or eviction, or on another worker, without holding the file in memory
+CACHE_SOURCE = os.getenv("CACHE_SOURCE", "true").lower() in ("1", "true", "yes")
+
+# Write-behind persistence - ingest publishes frames to the memory tier right away
+# and the background writer saves them to the disk cache in batches afterwards
+CACHE_WRITE_BEHIND = os.getenv("CACHE_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+CACHE_WRITER = WriteBehindQueue(
+    save_to_cache,
+    max_pending=int(os.getenv("CACHE_WRITE_QUEUE_SIZE", 32)),
+    batch_size=int(os.getenv("CACHE_WRITE_BATCH", 8)),
+    block_seconds=float(os.getenv("CACHE_WRITE_BLOCK_SECONDS", 5)),
+    on_batch=CACHE_JANITOR.wake
+)
+# Flattened images and default-window renders, keyed by source fingerprint,
+# parameters and algorithm version, kept on disk across restarts and shared by
+# every worker; written behind like ingested entries
+DERIVED_ARTIFACT_CACHE = DerivedArtifactCache(
+    CACHE_DIR, CACHE_INDEX, enabled=os.getenv("DERIVED_ARTIFACT_CACHE", "true").lower() in ("1", "true", "yes"),
+    write_behind=CACHE_WRITE_BEHIND, on_batch=CACHE_JANITOR.wake
+)
+# How long after another worker mapped a key a lookup waits for its disk cache
+# entry: the key is handed out as soon as the frames are in that worker's
+# memory, while they are still being written behind
+CACHE_PENDING_WAIT_SECONDS = float(os.getenv("CACHE_PENDING_WAIT_SECONDS", 10))
+# Cache writes requested while processing a file in an ingest worker, by key;
+# run_ingest_job hands them back to the API process, which queues them on CACHE_WRITER
+PENDING_CACHE_WRITES = {}
+# Frame numbers an ingest worker has already sent to the API process as "frame"
+# events, by key; run_ingest_job leaves them out of the entry it returns
+PUBLISHED_FRAMES = {}
+
+# Entry fields a lazily rendered entry is rebuilt with from its container
+LAZY_ENTRY_FIELDS = ("number_of_frames", "encapsulated", "display_window", "default_window", "raw_range",
+                     "passthrough", "spacing", "is_oct", "middle_frame_index")
+
+def lazy_cache_layout(entry: dict) -> dict:
+    """
+    Container layout of a lazily rendered entry: the codestreams of its frame
+    source, or its windowed volume with one frame's worth of bytes per
+    container frame, plus the fields it is rendered with.
+    """
+    layout = {"fields": {name: entry[name] for name in LAZY_ENTRY_FIELDS if name in entry}}
+    if "frame_source" in entry:
+        layout["kind"] = "encapsulated"
+        layout["header"] = entry["frame_source"].header()
+    else:
+        layout["kind"] = "volume"
+        layout["shape"] = list(entry["volume"].shape)
+        layout["dtype"] = str(entry["volume"].dtype)
+    return layout
+
+def cache_frames(entry: dict, frame_keys: dict, layout: Optional[dict]) -> dict:
+    """The payload of every container frame of an entry, by cache frame number."""
+    kind = layout["kind"] if layout else None
+    if kind == "encapsulated":
+        source = entry["frame_source"]
+        return {frame: source.raw_frame(frame) for frame in range(source.number_of_frames)}
+    if kind == "volume":
+        volume = np.ascontiguousarray(entry["volume"]).reshape(entry["number_of_frames"], -1)
+        return {frame: pixels.tobytes() for frame, pixels in enumerate(volume)}
+    return {frame_num: entry[k] for frame_num, k in frame_keys.items() if k in entry}
+
+def queue_cache_write(key: str, crc: str, frame_keys: dict, file_type: str, file_info: dict,
+                      layout: Optional[dict] = None) -> bool:
+    """
+    Persist the encoded frames of a stored entry to the disk cache.
+
+    frame_keys maps each cache frame number to the key of its BytesIO in
+    stored_images[key]; lazily rendered entries pass none and the layout from
+    lazy_cache_layout instead. With CACHE_WRITE_BEHIND the write is only
+    recorded here and made by CACHE_WRITER once the entry is installed in the
+    API process, so the job finishes without waiting for the disk; otherwise
+    the frames are saved right away.
+    """
+    if CACHE_WRITE_BEHIND:
+        PENDING_CACHE_WRITES[key] = {
+            "crc": crc,
+            "frame_keys": dict(frame_keys),
+            "file_type": file_type,
+            "file_info": file_info,
+            "layout": layout
+        }
+        return True
+    entry = stored_images[key]
+    return save_to_cache(crc, cache_frames(entry, frame_keys, layout), file_type, file_info,
+                         source=entry.get("dicom_bytes") if CACHE_SOURCE else None, layout=layout)
+
+def submit_cache_write(key: str, entry: dict, cache_write: dict):
+    """
+    Queue a cache write recorded by queue_cache_write for an installed entry
+    (runs in the API process). Called from job completion, so it never waits
+    for room in the queue itself.
+    """
+    missing = [k for k in cache_write["frame_keys"].values() if k not in entry]
+    if missing:
+        logger.warning(f"Not caching {key}: {len(missing)} frame(s) missing")
+        return
+    frames = cache_frames(entry, cache_write["frame_keys"], cache_write["layout"])
+    source = entry.get("dicom_bytes") if CACHE_SOURCE else None
+    CACHE_WRITER.submit_later(cache_write["crc"], cache_write["crc"], frames, cache_write["file_type"],
+                              cache_write["file_info"], source, cache_write["layout"])
+
+def find_cache_entry(crc: str, file_type: Optional[str] = None) -> Optional[Path]:
+    """
+    Path of the cache entry for a CRC (a container, or a directory written by
+    the old per-frame format), looked up in the cache index. Pass the file
+    type being ingested to count a miss against it.
+    """
+    entry = CACHE_INDEX.lookup(crc)
+    if entry is not None and not entry["path"].exists():
+        # Removed behind the index's back
+        CACHE_INDEX.remove(crc)
+        entry = None
+    if entry is None:
+        if file_type is not None:
+            CACHE_INDEX.record_miss(file_type)
+        return None
+    return entry["path"]
+
+def read_cache_metadata(cache_path: Path) -> dict:
+    """Metadata of a cache entry (container or old per-frame directory) without loading its frames."""
+    if cache_path.is_dir():
+        metadata_file = cache_path / "metadata.pkl"
+        if not metadata_file.exists():
+            return {}
+        with open(metadata_file, "rb") as f:
+            return pickle.load(f)
+    with FrameContainer(cache_path) as container:
+        return container.metadata
+
+def read_cached_source(crc: Optional[str], container: Optional[FrameContainer] = None) -> Optional[bytes]:
+    """The source file kept in the disk cache entry for crc, or None (entry gone, legacy or written without it)."""
+    if container is not None:
+        return container.source()
+    cache_path = find_cache_entry(crc) if crc else None
+    if cache_path is None or cache_path.is_dir():
+        return None
+    try:
+        with FrameContainer(cache_path) as cached:
+            return cached.source()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read the source of cache entry {crc}: {str(e)}")
+        return None
+
+def has_cached_source(cache_path: Path) -> bool:
+    """Whether a disk cache entry keeps the source file it was made from."""
+    if cache_path.is_dir():
+        return False
+    try:
+        with FrameContainer(cache_path) as container:
+            return container.has_source
+    except (OSError, ValueError):
+        return False
+
+def legacy_entry_matches(legacy_path: Path, file_path: str) -> bool:
+    """
+    Whether a cache entry found under a CRC32 key was written for the file
+    being ingested: its recorded source size, and for DICOM its frame count,
+    must match. A CRC32 alone collides far too easily to be trusted.
+    """
     try:
-        # Search all file type subdirectories
-        for file_type in ["dicom", "e2e", "fda"]:
-            cache_dir = CACHE_DIR / file_type
-            cache_path = cache_dir / crc
+        metadata = read_cache_metadata(legacy_path)
+        cached_size = metadata.get("file_info", {}).get("size")
+        if not cached_size or cached_size != os.path.getsize(file_path):
+            return False
+        if metadata.get("file_type") == "dicom":
+            header = pydicom.dcmread(file_path, stop_before_pixels=True, force=True)
+            if metadata.get("number_of_frames") != int(getattr(header, "NumberOfFrames", 1) or 1):
+                return False
+        return True
+    except Exception as e:
+        logger.warning(f"Could not verify cache entry {legacy_path}: {str(e)}")
+        return False
+
+def adopt_legacy_cache_entry(crc: str, legacy_keys, file_path: str) -> bool:
+    """
+    Move a cache entry written under an old CRC32 key to its fingerprint key,
+    once it is known to belong to file_path. Entries that do not match are
+    left in place for the janitor to age out.
 
-            if cache_path.exists():
-                break  # Found the cache, so exit the loop
+    Returns True if an entry for the fingerprint exists afterwards.
+    """
+    if find_cache_entry(crc) is not None:
+        return True
+    for legacy_key in legacy_keys:
+        if not legacy_key or legacy_key == crc:
+            continue
+        legacy_path = find_cache_entry(legacy_key)
+        if legacy_path is None:
+            continue
+        if not legacy_entry_matches(legacy_path, file_path):
+            logger.info(f"Cache entry {legacy_key} does not match {file_path}, not migrating it")
+            continue
+        file_type = legacy_path.relative_to(CACHE_DIR).parts[0]
+        if legacy_path.is_dir():
+            target = CACHE_DIR / file_type / crc
         else:
-            # No cache found in any directory
-            return {}, {}
+            target = container_path(CACHE_DIR, file_type, crc)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(legacy_path, target)
+            CACHE_INDEX.rename(legacy_key, crc, target)
+            logger.info(f"Migrated cache entry {legacy_key} to fingerprint {crc}")
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to migrate cache entry {legacy_key}: {str(e)}")
+    return False
+
+def load_legacy_cache_entry(cache_path: Path) -> tuple[dict, dict]:
+    """Load a cache directory of metadata.pkl plus one frame_N.jpg per frame."""
+    metadata_file = cache_path / "metadata.pkl"
+    if not metadata_file.exists():
+        logger.warning(f"Cache metadata missing for {cache_path}")
+        return {}, {}
 
-        if not cache_path.exists():
-            return {}, {}
+    with open(metadata_file, "rb") as f:
+        metadata = pickle.load(f)
 
-        # Load and validate metadata
-        metadata_file = cache_path / "metadata.pkl"
-        if not metadata_file.exists():
-            logger.warning(f"Cache metadata missing for CRC: {crc}")
-            return {}, {}
+    cached_images = {}
+    for frame_file in cache_path.glob("frame_*.jpg"):
+        try:
+            frame_num = int(frame_file.stem.split('_')[1])
+            img_data = io.BytesIO()
+            with open(frame_file, "rb")  as f:
+                img_data.write(f.read())
+            img_data.seek(0)
+            cached_images[frame_num] = img_data
+        except Exception as e:
+            logger.error(f"Failed to load frame {frame_file}: {str(e)}")
+    return cached_images, metadata
 
-        with open(metadata_file, "rb") as f:
-            metadata = pickle.load(f)
+def load_from_cache(crc: str, cache_path: Optional[Path] = None, touch: bool = True) -> tuple[dict, dict]:
+    """
+    Enhanced load from cache with validation. cache_path skips the index
+    lookup if already known; touch=False loads without counting an access.
+    """
+    try:
+        if cache_path is None:
+            cache_path = find_cache_entry(crc)
+        if cache_path is None:
+            return {}, {}
 
-        # Check cache age (optional - expire after 7 days)
-        cache_age = time.time() - metadata.get("cached_at", 0)
-        if cache_age > (7 * 24 * 3600):  # 7 days
-            logger.info(f"Cache expired for CRC: {crc} (age: {cache_age/3600:.1f} hours)")
+        if cache_path.is_dir():
+            cached_images, metadata = load_legacy_cache_entry(cache_path)
+            if not metadata:
+                return {}, {}
+        else:
+            with FrameContainer(cache_path) as container:
+                metadata = container.metadata
+                cached_images = {frame: io.BytesIO(container.frame(frame)) for frame in container.frame_numbers}
+
+        # Expire entries not accessed for CACHE_MAX_AGE_DAYS - the janitor's
+        # policy, so an entry in regular use never expires however old it is
+        index_entry = CACHE_INDEX.lookup(crc)
+        last_access = index_entry["last_access"] if index_entry else metadata.get("cached_at", 0)
+        idle = time.time() - last_access
+        if CACHE_MAX_AGE_DAYS and idle > (CACHE_MAX_AGE_DAYS * 24 * 3600):
+            logger.info(f"Cache expired for CRC: {crc} (not accessed for {idle/3600:.1f} hours)")
             cleanup_cache_entry(crc)
             return {}, {}
 
-        # Load frames
-        cached_images = {}
-        expected_frames = metadata.get("number_of_frames", 0)
-
-        for frame_file in cache_path.glob("frame_*.jpg"):
-            try:
-                frame_num = int(frame_file.stem.split('_')[1])
-                img_data = io.BytesIO()
-                with open(frame_file, "rb")  as f:
-                    img_data.write(f.read())
-                img_data.seek(0)
-                cached_images[frame_num] = img_data
-            except Exception as e:
-                logger.error(f"Failed to load frame {frame_file}: {str(e)}")
-
         # Validate frame count
+        expected_frames = metadata.get("number_of_frames", 0)
         if len(cached_images) != expected_frames:
             logger.warning(f"Cache incomplete for CRC: {crc}. Expected {expected_frames}, got {len(cached_images)}")
             cleanup_cache_entry(crc)
             return {}, {}
 
+        # Last access drives LRU eviction
+        if touch:
+            CACHE_INDEX.touch(crc)
+            touch_entry(cache_path)
+
         logger.info(f"Successfully loaded {len(cached_images)} frames from cache for CRC: {crc}")
         return cached_images, metadata
     except Exception as e:
         logger.error(f"Error loading from cache for CRC {crc}: {str(e)}")
         return {}, {}
 
-    def cleanup_cache_entry(crc: str):
-        """Clean up a specific cache entry."""
-        try:
-            # Search all file type subdirectories
-            for file_type in ["dicom", "e2e", "fda"]:
-                cache_dir = CACHE_DIR / file_type
-                cache_path = cache_dir / crc
-                if cache_path.exists():
-                    shutil.rmtree(cache_path)
-                    logger.info(f"Cleaned up cache entry: {crc}")
-                    return
+def load_cache_hit(key: str, crc: str, cache_path: Path, file_path: str) -> Optional[JSONResponse]:
+    """
+    Answer an ingest from the disk cache entry of its file, or return None if
+    the entry cannot be read. Only a marker is stored under key: the API
+    process restores the entry itself (see _finish_ingest_job), mapping the
+    container there instead of copying its frames back from the worker.
+    """
+    logger.info(f"Loading from CRC cache: {crc}")
+    try:
+        metadata = read_cache_metadata(cache_path)
+    except Exception as e:
+        logger.error(f"Error loading from cache for CRC {crc}: {str(e)}")
+        return None
+    if not metadata:
+        return None
 
-        except Exception as e:
-            logger.error(f"Failed to cleanup cache entry {crc}: {str(e)}")
+    stored_images[key] = {"restore_from_cache": True, "timestamp": time.time(), "crc": crc}
 
-    def cleanup_old_cache_entries(max_age_days: int = 7):
-        """Clean up old cache entries."""
-        try:
-            current_time = time.time()
-            max_age_seconds = max_age_days * 24 * 3600
-
-            for file_type in ["dicom", "e2e", "fda"]:
-                cache_dir = CACHE_DIR / file_type
-                if not cache_dir.exists():
-                    continue
-                for cache_dir_crc in cache_dir.iterdir():
-                    if cache_dir_crc.is_dir():
-                        metadata_file = cache_dir_crc / "metadata.pkl"
-                        if metadata_file.exists():
-                            try:
-                                with open(metadata_file, "rb") as f:
-                                    metadata = pickle.load(f)
-
-                                cache_age = current_time - metadata.get("cached_at", 0)
-                                if cache_age > max_age_seconds:
-                                    shutil.rmtree(cache_dir_crc)
-                                    logger.info(f"Cleaned up old cache entry: {cache_dir_crc.name}")
-                            except Exception as e:
-                                logger.error(f"Error checking cache age for {cache_dir_crc}: {str(e)}")
+    # Clean up temporary file
+    if os.path.exists(file_path):
+        os.remove(file_path)
 
-        except Exception as e:
-            logger.error(f"Failed to cleanup old cache entries: {str(e)}")
+    return JSONResponse(content={
+        "message": "File loaded from CRC cache.",
+        "number_of_frames": metadata.get("number_of_frames", 0),
+        "dicom_file_path": key,
+        "cache_source": "disk"
+    })
+
+def cleanup_cache_entry(crc: str):
+    """Clean up a specific cache entry."""
+    try:
+        cache_path = find_cache_entry(crc)
+        if cache_path is not None:
+            remove_entry(cache_path)
+            CACHE_INDEX.remove(crc)
+            logger.info(f"Cleaned up cache entry: {crc}")
+
+    except Exception as e:
+        logger.error(f"Failed to cleanup cache entry {crc}: {str(e)}")
+
+def cleanup_old_cache_entries(max_age_days: int = CACHE_MAX_AGE_DAYS):
+    """Clean up cache entries not accessed for max_age_days."""
+    try:
+        cutoff = time.time() - max_age_days * 24 * 3600
+        for entry in CACHE_INDEX.entries(CACHE_FILE_TYPES):
+            if entry.last_access < cutoff:
+                remove_entry(entry.path)
+                CACHE_INDEX.remove(entry.key)
+                logger.info(f"Cleaned up old cache entry: {entry.key}")
+
+    except Exception as e:
+        logger.error(f"Failed to cleanup old cache entries: {str(e)}")
 
 # CRC-based endpoint for getting file CRC
 @app.get("/api/get-file-crc")
@@ -316,47 +635,69 @@ async def get_file_crc(path: str = Query(...)):
         raise HTTPException(status_code=500, detail=f"Error getting file CRC: {str(e)}")
 
 # Utility functions
+def get_dicom_window(dicom) -> Optional[tuple[float, float]]:
+    """Return the dataset's default (WindowCenter, WindowWidth), or None if it has none."""
+    window_center = dicom.get('WindowCenter', None)
+    window_width = dicom.get('WindowWidth', None)
+
+    if window_center is None or window_width is None:
+        return None
+
+    # Handle cases where WC/WW are lists or sequences
+    if hasattr(window_center, '__iter__') and not isinstance(window_center, str):
+        window_center = float(window_center[0])
+    else:
+        window_center = float(window_center)
+
+    if hasattr(window_width, '__iter__') and not isinstance(window_width, str):
+        window_width = float(window_width[0])
+    else:
+        window_width = float(window_width)
+
+    return window_center, window_width
+
+def get_dicom_spacing(dicom) -> Optional[list]:
+    """
+    Voxel spacing in mm as [between slices, rows, columns], from the dataset
+    or its shared functional groups. Unknown components are None; None if
+    nothing is known.
+    """
+    measures = dicom
+    if 'PixelSpacing' not in dicom and hasattr(dicom, 'SharedFunctionalGroupsSequence'):
+        try:
+            measures = dicom.SharedFunctionalGroupsSequence[0].PixelMeasuresSequence[0]
+        except (AttributeError, IndexError):
+            pass
+
+    spacing = [None, None, None]
+    try:
+        pixel_spacing = measures.get('PixelSpacing', None)
+        if pixel_spacing is not None:
+            spacing[1], spacing[2] = float(pixel_spacing[0]), float(pixel_spacing[1])
+        between_slices = measures.get('SpacingBetweenSlices', None) or measures.get('SliceThickness', None)
+        if between_slices is not None:
+            spacing[0] = float(between_slices)
+    except (TypeError, ValueError, IndexError):
+        logger.warning("Could not read pixel spacing from dataset")
+    return spacing if any(v is not None for v in spacing) else None
+
 def apply_windowing(pixels, dicom):
     """Apply DICOM windowing (contrast adjustment) with enhanced error handling."""
     try:
-        window_center = dicom.get('WindowCenter', None)
-        window_width = dicom.get('WindowWidth', None)
-
-        if window_center is not None and window_width is not None:
-            # Handle cases where WC/WW are lists or sequences
-            if hasattr(window_center, '__iter__') and not isinstance(window_center, str):
-                window_center = float(window_center[0])
-            else:
-                window_center = float(window_center)
-
-            if hasattr(window_width, '__iter__') and not isinstance(window_width, str):
-                window_width = float(window_width[0])
-            else:
-                window_width = float(window_width)
+        window = get_dicom_window(dicom)
 
+        if window is not None:
+            window_center, window_width = window
             logger.debug(f"Applying windowing: WC={window_center}, WW={window_width}")
 
-            # Apply windowing
-            min_value = window_center - (window_width / 2)
-            max_value = window_center + (window_width / 2)
-
-            # Clip and normalize
-            pixels = np.clip(pixels, min_value, max_value)
-            pixels = (pixels - min_value) / (max_value - min_value)
-            pixels = (pixels * 255.0).astype(np.uint8)
+            # Clip and normalize through a lookup table (float64 path for signed/float data)
+            min_value, max_value = window_bounds(window_center, window_width)
+            pixels = apply_window(pixels, min_value, max_value)
 
         else:
             logger.debug("No windowing parameters found, using auto-normalization")
-            # Auto-normalize based on pixel intensity range
-            pixels_min = pixels.min()
-            pixels_max = pixels.max()
-
-            if pixels_max > pixels_min:
-                pixels = (pixels - pixels_min) / (pixels_max - pixels_min)
-                pixels = (pixels * 255.0).astype(np.uint8)
-            else:
-                # Handle edge case where all pixels have same value
-                pixels = np.full_like(pixels, 128, dtype=np.uint8)
+            # Auto-normalize based on pixel intensity range (mid-grey if all pixels are equal)
+            pixels = auto_window(pixels)
 
     except Exception as e:
         logger.warning(f"Windowing failed, using fallback normalization: {str(e)}")
@@ -385,6 +726,479 @@ def convert_dicom_to_image(pixels: np.ndarray, frame_number: int = 0) -> Image:
         pixels = pixels[frame_number]
     return Image.fromarray(pixels)
 
+def is_lazy_entry(data: dict) -> bool:
+    """Whether an entry's frames are rendered or read on demand rather than held as encoded buffers."""
+    return "volume" in data or "frame_source" in data or "container" in data
+
+def get_frame_count(data: dict) -> int:
+    """Number of frames of a stored entry, whether encoded at ingest or rendered on demand."""
+    if is_lazy_entry(data):
+        return data["number_of_frames"]
+    # list() takes the keys at once: ingest events may be adding frames meanwhile
+    return len([k for k in list(data) if isinstance(k, int)])
+
+def get_frame_numbers(data: dict) -> list:
+    """Sorted frame numbers available for a stored entry."""
+    if is_lazy_entry(data):
+        return list(range(data["number_of_frames"]))
+    return sorted(k for k in list(data) if isinstance(k, int))
+
+def get_stored_entry(key: str, count: bool = True) -> Optional[dict]:
+    """
+    Look up an entry in the memory tier, counting the hit or miss unless
+    count is False.
+
+    Entries evicted from memory, and keys issued by another API worker, are
+    restored from the disk cache through the cache index, whichever way they
+    were ingested (see restored_entry). Keys whose entry is still being
+    written by another worker are waited for (see wait_for_cache_write).
+    """
+    data = stored_images.get(key)
+    if data is not None:
+        if count:
+            MEMORY_STATS.hit(data.get("file_type", "unknown"))
+        stored_images.touch(key)
+        return data
+
+    evicted = stored_images.evicted.get(key) or CACHE_INDEX.lookup_key(key) or wait_for_cache_write(key)
+    if count:
+        MEMORY_STATS.miss(evicted[1] if evicted else "unknown")
+    if evicted is None:
+        return None
+
+    crc, file_type = evicted
+    return restore_from_disk_cache(key, crc, file_type)
+
+def wait_for_cache_write(key: str) -> Optional[tuple]:
+    """
+    (fingerprint, file_type) of a key another worker has just ingested, once
+    its disk cache entry is written. The key is handed out before its frames
+    are written behind; None if the key is not waiting for a write or the
+    write has not landed CACHE_PENDING_WAIT_SECONDS after the key was mapped.
+    """
+    mapped_at = CACHE_INDEX.pending_key(key)
+    if mapped_at is None:
+        return None
+    deadline = mapped_at + CACHE_PENDING_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(0.1)
+        mapping = CACHE_INDEX.lookup_key(key)
+        if mapping is not None:
+            return mapping
+    return None
+
+async def load_stored_entry(key: str, count: bool = True) -> Optional[dict]:
+    """
+    get_stored_entry for async handlers: entries in memory are returned
+    directly, while index lookups and restores from the disk cache run in the
+    threadpool instead of on the event loop.
+    """
+    if key in stored_images:
+        return get_stored_entry(key, count)
+    return await run_in_threadpool(get_stored_entry, key, count)
+
+def entry_validators(key: str) -> Optional[tuple]:
+    """
+    (fingerprint, last-modified time) of a stored entry for conditional
+    requests, taken from its in-memory metadata, an eviction tombstone or the
+    cache index - frames are never loaded. None while the fingerprint is not
+    known yet (the entry is still being ingested).
+    """
+    data = stored_images.get(key)
+    if data is not None:
+        crc = data.get("crc")
+        return (crc, data.get("timestamp")) if crc else None
+
+    mapping = stored_images.evicted.get(key) or CACHE_INDEX.lookup_key(key)
+    if mapping is None:
+        return None
+    entry = CACHE_INDEX.lookup(mapping[0])
+    return mapping[0], entry["created_at"] if entry else None
+
+def not_modified(request: Request, etag: Optional[str], last_modified: Optional[float],
+                 cache_control: str = IMMUTABLE, variant: Optional[dict] = None) -> Optional[Response]:
+    """A 304 response if the request's validators still match, else None."""
+    if etag is None or not is_not_modified(request.headers, etag, last_modified):
+        return None
+    headers = variant_headers(cache_headers(etag, last_modified, cache_control), variant)
+    return Response(status_code=304, headers=headers)
+
+def restore_from_disk_cache(key: str, crc: str, file_type: str, touch: bool = True) -> Optional[dict]:
+    """
+    Install the disk cache entry for crc into the memory tier under key.
+
+    Containers of encoded frames are memory-mapped rather than copied, so
+    workers serving the same entry share its pages through the OS page cache.
+    E2E entries cached without their per-eye layout cannot be restored.
+    """
+    cache_path = find_cache_entry(crc)
+    if cache_path is None or (file_type == "e2e" and cache_path.is_dir()):
+        stored_images.evicted.pop(key, None)
+        return None
+
+    if cache_path.is_dir():
+        # Old per-frame layout: frames are copied into memory
+        cached_images, metadata = load_from_cache(crc, cache_path, touch=touch)
+        if not cached_images:
+            stored_images.evicted.pop(key, None)
+            return None
+        restored = cached_images
+    else:
+        try:
+            restored = restored_entry(key, FrameContainer(cache_path))
+        except Exception as e:
+            logger.error(f"Failed to map cache entry {crc}: {str(e)}")
+            restored = None
+        if restored is None or (file_type == "e2e" and "left_eye_data" not in restored):
+            if restored is not None:
+                restored["container"].close()
+            stored_images.evicted.pop(key, None)
+            return None
+        if touch:
+            CACHE_INDEX.touch(crc)
+            touch_entry(cache_path)
+
+    with stored_images.lock:
+        data = stored_images.setdefault(key, {})
+        data.update(restored)
+        data["timestamp"] = time.time()
+        data["crc"] = crc
+        data["file_type"] = file_type
+        stored_images.account(key)
+    logger.info(f"Restored {key} from disk cache ({get_frame_count(data)} frames)")
+    return data
+
+def restored_entry(key: str, container: FrameContainer) -> dict:
+    """
+    The fields of an entry rebuilt from its container, following the layout
+    in the container metadata. Containers of encoded frames stay mapped;
+    lazily rendered entries get their frame source or windowed volume back and
+    E2E entries their images under names prefixed with key.
+    """
+    layout = container.metadata.get("layout")
+    if layout is None:
+        return {"container": container, "number_of_frames": len(container)}
+
+    try:
+        frames = [container.frame(frame) for frame in container.frame_numbers]
+        if layout["kind"] == "e2e":
+            restored = {key + name: io.BytesIO(frames[i]) for i, name in enumerate(layout["names"])}
+            for eye_key in ("left_eye_data", "right_eye_data"):
+                restored[eye_key] = {kind: [key + name for name in names] for kind, names in layout[eye_key].items()}
+            return restored
+
+        restored = dict(layout["fields"])
+        if layout["kind"] == "encapsulated":
+            restored["frame_source"] = EncapsulatedFrameSource.from_frames(layout["header"], frames)
+        else:
+            restored["volume"] = np.frombuffer(b"".join(frames), dtype=layout["dtype"]).reshape(layout["shape"])
+        if restored.get("is_oct"):
+            restored["middle_frame_pixels"] = get_display_frame(restored, restored["middle_frame_index"])
+        return restored
+    finally:
+        container.close()
+
+def is_reloadable(key: str, data: dict) -> bool:
+    """Whether an entry's frames can be restored from the disk cache after eviction."""
+    crc = data.get("crc")
+    if not crc:
+        return False
+    cache_path = find_cache_entry(crc)
+    if cache_path is None:
+        return False
+    if data.get("file_type") == "e2e":
+        # Cached before E2E entries kept their per-eye layout: images only
+        return not cache_path.is_dir() and "layout" in read_cache_metadata(cache_path)
+    return True
+
+stored_images.can_reload = is_reloadable
+
+def get_display_frame(data: dict, frame: int) -> np.ndarray:
+    """Windowed uint8 pixels of one frame of a lazily rendered entry."""
+    if "volume" in data:
+        volume = data["volume"]
+        return volume[frame] if len(volume.shape) == 3 else volume
+
+    raw = data["frame_source"].decode(frame)
+    min_value, max_value = data["display_window"]
+    if max_value > min_value:
+        return apply_window(raw, min_value, max_value)
+    return auto_window(raw)
+
+def frame_stack(pixels: np.ndarray, samples_per_pixel: int = 1) -> np.ndarray:
+    """
+    Decoded pixels as (frames, rows, columns[, samples]). pydicom leaves out
+    the frame axis of single-frame data, so without this a (rows, columns, 3)
+    colour image would pass for a stack of rows frames.
+    """
+    return pixels[np.newaxis] if pixels.ndim == (2 if samples_per_pixel == 1 else 3) else pixels
+
+def retain_raw_volume(entry: dict, raw_pixels: np.ndarray, window: Optional[tuple[float, float]],
+                      samples_per_pixel: int = 1):
+    """Keep the pre-window pixels, as a frame stack, and default window of an entry for re-rendering."""
+    raw_pixels = frame_stack(raw_pixels, samples_per_pixel)
+    entry["raw_volume"] = raw_pixels
+    entry["default_window"] = window
+    entry["raw_range"] = (float(raw_pixels.min()), float(raw_pixels.max()))
+
+def load_raw_volume(key: str, data: dict) -> Optional[np.ndarray]:
+    """
+    Pre-window pixels of an entry. Unless they were retained at ingest, they
+    are decoded the first time they are needed - from the entry's DICOM
+    bytes, or for entries restored from the disk cache from the source file
+    kept in their cache entry - and kept in the entry from then on, counted
+    against the memory budget. None if neither is available (FDA, entries
+    cached without their source) or the pixels cannot be decoded.
+    """
+    raw_volume = data.get("raw_volume")
+    if raw_volume is not None:
+        return raw_volume
+    dicom_bytes = data.get("dicom_bytes")
+    if dicom_bytes is None:
+        dicom_bytes = read_cached_source(data.get("crc"), data.get("container"))
+    if dicom_bytes is None:
+        return None
+
+    dicom = pydicom.dcmread(io.BytesIO(dicom_bytes), force=True)
+    raw_volume = decompress_dicom_with_fallbacks(dicom, dicom_bytes)
+    if raw_volume is None:
+        return None
+    with stored_images.lock:
+        retain_raw_volume(data, raw_volume, get_dicom_window(dicom), int(dicom.get("SamplesPerPixel", 1)))
+        data["spacing"] = get_dicom_spacing(dicom)
+        raw_volume = data["raw_volume"]
+        if stored_images.get(key) is data:
+            stored_images.account(key)
+    logger.info(f"Decoded raw volume of {key} for re-rendering ({raw_volume.nbytes} bytes)")
+    return raw_volume
+
+def render_windowed_frame(key: str, data: dict, frame: int, wc: Optional[float] = None, ww: Optional[float] = None) -> Optional[bytes]:
+    """
+    Re-render a frame from the raw volume with the given window center/width.
+
+    Without wc/ww the dataset's default window (or the auto-range) is used,
+    which is what the stored frame already holds. Other windows reload the
+    raw pixels, from the disk cache if the entry was evicted or restored.
+    Compressed multi-frame entries decode the single frame from their frame
+    source. Results are cached in memory by (crc, frame, wc, ww); renders
+    with the default window also go to the derived artifact cache on disk.
+    Returns None if the entry has no raw pixels and no cached render, or the
+    frame is out of range.
+    """
+    if wc is None and ww is None:
+        # Stored frames were windowed with the default window when ingested
+        encoded = get_frame_bytes(key, data, frame)
+        if encoded is not None:
+            return encoded
+
+    cache_key = (data.get("crc") or key, frame, wc, ww)
+    encoded = RENDERED_FRAME_CACHE.get(cache_key)
+    if encoded is not None:
+        return encoded
+    # Only the default contrast is kept on disk: every step of a window/level
+    # drag is a new (wc, ww) pair, rarely asked for again
+    persist = wc is None and ww is None
+    window_params = {"frame": frame, "wc": wc, "ww": ww}
+    if persist:
+        # Rendered before by any worker - still valid when the entry was since restored without its raw pixels
+        encoded = DERIVED_ARTIFACT_CACHE.get(data.get("crc"), "window", window_params)
+        if encoded is not None:
+            RENDERED_FRAME_CACHE.put(cache_key, encoded)
+            return encoded
+
+    windowed = window_frame_pixels(key, data, frame, wc, ww)
+    if windowed is None:
+        return None
+    encoded = encode_frame(windowed).getvalue()
+    RENDERED_FRAME_CACHE.put(cache_key, encoded)
+    if persist:
+        DERIVED_ARTIFACT_CACHE.put(data.get("crc"), "window", window_params, encoded, "image/jpeg")
+    return encoded
+
+def window_frame_pixels(key: str, data: dict, frame: int, wc: Optional[float] = None,
+                        ww: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    uint8 pixels of a frame through the given window (the default window
+    without wc/ww), before any encoding. None if the entry has no raw pixels
+    or the frame is out of range.
+    """
+    source = data.get("frame_source")
+    # Compressed multi-frame entries decode just the frame from their source
+    raw_volume = data.get("raw_volume") if source is not None else load_raw_volume(key, data)
+    if raw_volume is not None:
+        number_of_frames = raw_volume.shape[0]
+    elif source is not None:
+        number_of_frames = source.number_of_frames
+    else:
+        return None
+    if not 0 <= frame < number_of_frames:
+        return None
+
+    if wc is not None and ww is not None:
+        min_value, max_value = window_bounds(wc, ww)
+    elif data.get("default_window") is not None:
+        min_value, max_value = window_bounds(*data["default_window"])
+    else:
+        min_value, max_value = data["raw_range"]
+
+    if raw_volume is not None:
+        frame_pixels = raw_volume[frame]
+    else:
+        frame_pixels = source.decode(frame)
+    if max_value > min_value or wc is not None:
+        return apply_window(frame_pixels, min_value, max_value)
+    return auto_window(frame_pixels)
+
+def is_frame_available(data: dict, frame: int) -> bool:
+    """Whether a frame can be served right now (encoded already or renderable on demand)."""
+    if frame in data:
+        return True
+    return is_lazy_entry(data) and 0 <= frame < data["number_of_frames"]
+
+def announce_frames(key: str, number_of_frames: int, first_frame: int):
+    """Record how many frames an ingest will produce so readiness can be reported per frame."""
+    stored_images[key]["expected_frames"] = number_of_frames
+    stored_images[key]["first_frame"] = first_frame
+    jobs.emit("frames_expected", key=key, number_of_frames=number_of_frames, first_frame=first_frame)
+
+def publish_frame(key: str, frame: int, buf: io.BytesIO):
+    """Make an encoded frame servable as soon as it exists, also from inside an ingest worker."""
+    stored_images[key][frame] = buf
+    if jobs.emit("frame", key=key, frame=frame, data=buf.getvalue()):
+        PUBLISHED_FRAMES.setdefault(key, set()).add(frame)
+
+def render_frame(key: str, data: dict, frame: int) -> Optional[bytes]:
+    """
+    Encode a frame of a lazily ingested volume, going through the encoded-frame LRU.
+
+    Pass-through entries return the stored JPEG codestream as is, and entries
+    mapped from the disk cache return their stored frame. Returns None if the
+    entry has no volume or the frame is out of range.
+    """
+    if not is_lazy_entry(data) or not 0 <= frame < data["number_of_frames"]:
+        return None
+
+    if data.get("passthrough"):
+        # Stored baseline JPEG is already display-ready - serve it untouched
+        return data["frame_source"].raw_frame(frame)
+
+    if "container" in data:
+        # Entry mapped from the disk cache: frames are already encoded
+        return data["container"].frame(frame)
+
+    cache_key = (data.get("crc") or key, frame)
+    encoded = ENCODED_FRAME_CACHE.get(cache_key)
+    if encoded is None:
+        encoded = encode_frame(get_display_frame(data, frame)).getvalue()
+        ENCODED_FRAME_CACHE.put(cache_key, encoded)
+        logger.debug(f"Rendered frame {frame} of {key} on demand ({len(encoded)} bytes)")
+    return encoded
+
+def lazy_frame_pixels(data: dict, frame: int) -> Optional[np.ndarray]:
+    """
+    uint8 pixels of a frame of a lazily rendered entry, for encoding it in
+    another format. None for frames only held encoded, including stored
+    JPEG served as is and entries mapped from the disk cache.
+    """
+    if not is_lazy_entry(data) or "container" in data or data.get("passthrough"):
+        return None
+    if not 0 <= frame < data["number_of_frames"]:
+        return None
+    return get_display_frame(data, frame)
+
+def get_frame_bytes(key: str, data: dict, frame: int) -> Optional[bytes]:
+    """Encoded bytes of one frame, encoding lazily ingested frames on first request. None if out of range."""
+    if frame in data:
+        return data[frame].getvalue()
+    return render_frame(key, data, frame)
+
+def frame_size(data: dict, frame: int) -> Optional[int]:
+    """Byte size of an encoded frame if it is known without encoding it."""
+    buf = data.get(frame)
+    if buf is not None:
+        return buf.getbuffer().nbytes
+    if "container" in data and frame in data["container"]:
+        return data["container"].index[frame][1]
+    return None
+
+def resolve_frame_variant(size: str = "full", fmt: Optional[str] = None, quality: Optional[int] = None,
+                          accept: Optional[str] = None) -> dict:
+    """
+    The size, format and quality a frame request asks for. fmt and quality
+    come from the query; without fmt the format is negotiated from accept.
+    """
+    if size not in FRAME_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(FRAME_SIZES)}.")
+    if fmt is not None and fmt not in FRAME_FORMATS:
+        raise HTTPException(status_code=400, detail=f"fmt must be one of {', '.join(FRAME_FORMATS)}.")
+    if quality is not None and not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="q must be between 1 and 100.")
+    negotiated = fmt is None and accept is not None and FRAME_FORMAT_NEGOTIATION
+    if fmt is None:
+        fmt = negotiate_format(accept) if negotiated else "jpeg"
+    if size == "full" and fmt == "jpeg" and quality == JPEG_QUALITY:
+        # The quality frames are stored at: the stored frame itself
+        quality = None
+    return {"size": size, "fmt": fmt, "quality": quality, "negotiated": negotiated}
+
+def is_stored_variant(variant: Optional[dict]) -> bool:
+    """Whether a variant is the frame exactly as stored (full-size baseline JPEG)."""
+    return variant is None or (variant["size"] == "full" and variant["fmt"] == "jpeg" and variant["quality"] is None)
+
+def variant_etag_part(variant: Optional[dict]) -> Optional[tuple]:
+    """What sets a variant's bytes apart from the stored frame, for its ETag; None for the stored frame."""
+    if is_stored_variant(variant):
+        return None
+    preview = PREVIEW_SETTINGS if variant["size"] == "preview" else None
+    return variant["size"], preview, variant["fmt"], variant["quality"]
+
+def variant_media_type(variant: Optional[dict]) -> str:
+    return FRAME_FORMATS[variant["fmt"]].media_type if variant else "image/jpeg"
+
+def variant_headers(headers: dict, variant: Optional[dict]) -> dict:
+    if variant and variant["negotiated"]:
+        headers["Vary"] = "Accept"
+    return headers
+
+def frame_etag(crc: str, frame: int, variant: Optional[dict] = None) -> str:
+    """ETag of a frame served by /api/view_dicom_png."""
+    part = variant_etag_part(variant)
+    if part is None:
+        return strong_etag(crc, "frame", frame, FRAME_ETAG_SETTINGS)
+    return strong_etag(crc, "frame", frame, part, FRAME_ETAG_SETTINGS)
+
+def get_frame_variant(cache_key: tuple, produce: Callable[[], Optional[bytes]], variant: Optional[dict],
+                      pixels: Optional[Callable[[], Optional[np.ndarray]]] = None) -> Optional[bytes]:
+    """
+    A frame in the requested size/format/quality.
+
+    The stored frame is what produce() returns. Any other variant is made on
+    first request and kept in PREVIEW_FRAME_CACHE (previews) or
+    FRAME_VARIANT_CACHE, keyed by cache_key and the variant: encoded straight
+    from the frame's uint8 pixels when pixels() can give them, so PNG stays
+    lossless and WebP is a first-generation encode, else re-encoded from the
+    stored frame. None if neither is available.
+    """
+    if is_stored_variant(variant):
+        return produce()
+    preview = variant["size"] == "preview"
+    cache = PREVIEW_FRAME_CACHE if preview else FRAME_VARIANT_CACHE
+    variant_key = cache_key + (variant["size"], variant["fmt"], variant["quality"])
+    encoded = cache.get(variant_key)
+    if encoded is not None:
+        return encoded
+    frame_pixels = pixels() if pixels is not None else None
+    if frame_pixels is not None:
+        encoded = encode_pixels(frame_pixels, variant["fmt"], variant["quality"], PREVIEW_MAX_SIDE if preview else None)
+        cache.put(variant_key, encoded)
+        return encoded
+    stored = produce()
+    if stored is None:
+        return None
+    encoded = encode_variant(stored, variant["fmt"], variant["quality"], PREVIEW_MAX_SIDE if preview else None)
+    cache.put(variant_key, encoded)
+    return encoded
+
 def check_dicom_compression(dicom_dataset) -> tuple[bool, str]:
     """
     Check if DICOM file is compressed and identify the compression type.
@@ -417,76 +1231,38 @@ def check_dicom_compression(dicom_dataset) -> tuple[bool, str]:
         # No transfer syntax info available
         return False, 'Unknown'
 
-def decompress_dicom_with_fallbacks(dicom_dataset, file_path: str) -> Optional[np.ndarray]:
+def _report_decode_result(transfer_syntax: str, backend: str, success: bool, elapsed_ms: float):
+    # Inside ingest workers, forward decode outcomes so the API process has the aggregate counters
+    jobs.emit("decode", transfer_syntax=transfer_syntax, backend=backend, success=success, elapsed_ms=elapsed_ms)
+
+# Decoder registry: remembers which backend decoded each transfer syntax and tries it first next time
+DICOM_DECODERS = DecoderRegistry(on_result=_report_decode_result)
+DICOM_DECODERS.register("default", decode_default)
+if PYLIBJPEG_AVAILABLE:
+    DICOM_DECODERS.register("pylibjpeg", decode_pylibjpeg)
+if GDCM_AVAILABLE:
+    DICOM_DECODERS.register("gdcm", decode_gdcm)
+DICOM_DECODERS.register("decompress", decode_decompress)
+
+def decompress_dicom_with_fallbacks(dicom_dataset, dicom_bytes: Optional[bytes] = None) -> Optional[np.ndarray]:
     """
-    Attempt to decompress DICOM pixel data using multiple fallback methods.
+    Attempt to decompress DICOM pixel data using the decoder registry.
 
     Args:
         dicom_dataset: pydicom dataset
-        file_path: path to the DICOM file
+        dicom_bytes: raw file content; fallback decoders re-parse from it instead of re-reading the file
 
     Returns:
         numpy array of pixel data or None if all methods fail
     """
     is_compressed, compression_type = check_dicom_compression(dicom_dataset)
 
-    if not is_compressed:
+    if is_compressed:
+        logger.info(f"Detected compressed DICOM with {compression_type} compression")
+    else:
         logger.info("DICOM file is not compressed, using standard pixel_array")
-        try:
-            return dicom_dataset.pixel_array
-        except Exception as e:
-            logger.warning(f"Standard pixel_array access failed: {str(e)}")
-
-    logger.info(f"Detected compressed DICOM with {compression_type} compression")
-
-    # Method 1: Try pydicom with pylibjpeg
-    if PYLIBJPEG_AVAILABLE:
-        try:
-            logger.info("Attempting decompression with pylibjpeg...")
-            # Force pydicom to use pylibjpeg for decompression
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                pixel_array = dicom_dataset.pixel_array
-            logger.info("Successfully decompressed with pylibjpeg")
-            return pixel_array
-        except Exception as e:
-            logger.warning(f"pylibjpeg decompression failed: {str(e)}")
-
-    # Method 2: Try with GDCM by re-reading the file
-    if GDCM_AVAILABLE:
-        try:
-            logger.info("Attempting decompression with GDCM...")
-            # Re-read with fresh pydicom instance
-            dicom_gdcm = pydicom.dcmread(file_path, force=True)
-            pixel_array = dicom_gdcm.pixel_array
-            logger.info("Successfully decompressed with GDCM")
-            return pixel_array
-        except Exception as e:
-            logger.warning(f"GDCM decompression failed: {str(e)}")
-
-    # Method 3: Try forcing decompression to explicit VR
-    try:
-        logger.info("Attempting forced decompression...")
-        # Create a copy to avoid modifying the original
-        dicom_copy = pydicom.dcmread(file_path, force=True)
-        dicom_copy.decompress()
-        pixel_array = dicom_copy.pixel_array
-        logger.info("Successfully decompressed with forced decompression")
-        return pixel_array
-    except Exception as e:
-        logger.warning(f"Forced decompression failed: {str(e)}")
-
-    # Method 4: Try basic pixel array access with error handling
-    try:
-        logger.info("Attempting basic pixel array access...")
-        # Sometimes the original dataset works despite initial failure
-        pixel_array = dicom_dataset.pixel_array
-        logger.info("Successfully accessed pixel array on retry")
-        return pixel_array
-    except Exception as e:
-        logger.warning(f"Basic pixel array access failed: {str(e)}")
 
-    return None
+    return DICOM_DECODERS.decode(dicom_dataset, dicom_bytes)
 
 def enhance_contrast(img, clip_limit=2.0, grid_size=(8,8)):
     """Enhanced contrast using CLAHE"""
@@ -987,46 +1763,125 @@ def apply_oct_flattening(pixels: np.ndarray, is_middle_frame: bool = False) -> n
             # Last resort - return a blank image
             return np.zeros((512, 512), dtype=np.uint8)
 
-def process_dicom_file(file_path: str, key: str, crc: str):
+def attach_frame_source(entry: dict):
+    """Rebuild the per-frame source of an encapsulated entry from its DICOM bytes (header and offset table only)."""
+    dicom = pydicom.dcmread(io.BytesIO(entry["dicom_bytes"]), force=True)
+    entry["frame_source"] = EncapsulatedFrameSource(dicom, entry["number_of_frames"])
+
+def ingest_encapsulated_frames(file_path: str, key: str, crc: str, dicom, dicom_bytes: bytes,
+                               number_of_frames: int, compression_type: str) -> Optional[JSONResponse]:
+    """
+    Ingest a compressed multi-frame DICOM without decoding the whole volume.
+
+    Frames are decoded and kept one at a time: the middle frame for OCT
+    flattening and, when the dataset has no window, every frame once to
+    auto-window over the volume's full range. Returns None if the frames cannot
+    be decoded individually, in which case the caller decodes the full volume.
+    """
+    try:
+        source = EncapsulatedFrameSource(dicom, number_of_frames)
+        middle_frame_index = number_of_frames // 2
+        middle_raw = source.decode(middle_frame_index)
+    except Exception as e:
+        logger.warning(f"Per-frame decoding not possible, decoding the whole volume: {str(e)}")
+        return None
+
+    window = get_dicom_window(dicom)
+    if window is not None:
+        display_window = window_bounds(*window)
+    elif source.display_ready:
+        # 8-bit greyscale JPEG is shown with its stored contrast
+        display_window = (0.0, 255.0)
+    else:
+        # Auto-window over the whole volume, as the full decode path does
+        display_window = source.value_range()
+
+    if key not in stored_images:
+        stored_images[key] = {}
+
+    entry = stored_images[key]
+    entry["dicom_bytes"] = dicom_bytes
+    entry["timestamp"] = time.time()
+    entry["crc"] = crc
+    entry["frame_source"] = source
+    entry["encapsulated"] = True
+    entry["number_of_frames"] = number_of_frames
+    entry["display_window"] = display_window
+    entry["default_window"] = window
+    entry["raw_range"] = display_window
+    entry["spacing"] = get_dicom_spacing(dicom)
+    # An identity window over display-ready JPEG frames means they can be served without decoding
+    entry["passthrough"] = JPEG_PASSTHROUGH and source.display_ready and display_window == (0.0, 255.0)
+
+    # Multi-frame images are treated as OCT scans, as in the full decode path
+    entry["is_oct"] = number_of_frames > 1
+    entry["middle_frame_index"] = middle_frame_index
+    entry["middle_frame_pixels"] = get_display_frame(entry, middle_frame_index)
+    if entry["passthrough"]:
+        logger.info(f"Indexed {number_of_frames} {compression_type} frames for pass-through serving")
+    else:
+        logger.info(f"Indexed {number_of_frames} {compression_type} frames for on-demand decoding")
+
+    # The disk cache keeps the codestreams, so any worker can rebuild the frame source
+    try:
+        file_info = {
+            "name": os.path.basename(file_path),
+            "size": len(dicom_bytes),
+            "compression_type": compression_type,
+            "is_compressed": True
+        }
+        queue_cache_write(key, crc, {}, "dicom", file_info, layout=lazy_cache_layout(entry))
+        logger.info(f"Queued encapsulated DICOM frames for the CRC cache: {crc}")
+    except Exception as e:
+        logger.warning(f"Failed to save to CRC cache: {str(e)}")
+
+    try:
+        os.remove(file_path)
+        logger.info(f"Cleaned up temporary file: {file_path}")
+    except Exception as e:
+        logger.warning(f"Failed to clean up file {file_path}: {str(e)}")
+
+    return JSONResponse(content={
+        "message": "File uploaded successfully.",
+        "number_of_frames": number_of_frames,
+        "dicom_file_path": key,
+        "cache_source": "fresh_download",
+        "frame_decoding": "passthrough" if entry["passthrough"] else "on_demand",
+        "compression_info": {
+            "is_compressed": True,
+            "compression_type": compression_type
+        }
+    })
+
+def process_dicom_file(file_path: str, key: str, crc: str, file_bytes: Optional[bytes] = None):
     """
     Enhanced DICOM processing function with compressed DICOM support and CRC-based caching.
+
+    file_bytes is the file content if the caller has already read it (e.g. to
+    compute the CRC); the file is then not read from disk again.
     """
     logger.info(f"Processing DICOM file: {file_path}")
 
     try:
-        # Check CRC-based cache first
-        cache_path = get_cache_path(crc)
-        if cache_path.exists():
-            logger.info(f"Loading from CRC cache: {crc}")
-            cached_images, metadata = load_from_cache(crc)
-
-            if cached_images:  # Only proceed if we have cached images
-                stored_images[key] = cached_images
-
-                # Store timestamp and CRC for cache management
-                stored_images[key]["timestamp"] = time.time()
-                stored_images[key]["crc"] = crc
-
-                # Clean up temporary file
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-
-                return JSONResponse(content={
-                    "message": "File loaded from CRC cache.",
-                    "number_of_frames": metadata.get("number_of_frames", len(cached_images)),
-                    "dicom_file_path": key,
-                    "cache_source": "disk"
-                })
+        # Check the cache index first
+        cache_path = find_cache_entry(crc, "dicom")
+        if cache_path is not None and CACHE_SOURCE and not has_cached_source(cache_path):
+            # Cached before sources were kept with the frames: ingest it again,
+            # so the raw pixels can be decoded from the new entry later on
+            logger.info(f"Cache entry {crc} has no source file, processing it again")
+            cache_path = None
+        if cache_path is not None:
+            response = load_cache_hit(key, crc, cache_path, file_path)
+            if response is not None:
+                return response
 
         # Continue with normal processing if no cache or cache failed...
-        # Read DICOM file
-        dicom = pydicom.dcmread(file_path, force=True)
+        # Read the file once; the same buffer is parsed and kept as the raw
+        # DICOM bytes for flattening operations
+        dicom_bytes = file_bytes if file_bytes is not None else read_file_once(file_path)
+        dicom = pydicom.dcmread(io.BytesIO(dicom_bytes), force=True)
         logger.info(f"Successfully read DICOM file: {file_path}")
 
-        # Store the raw DICOM bytes for flattening operations
-        with open(file_path, 'rb') as f:
-            dicom_bytes = f.read()
-
         # Check compression status
         is_compressed, compression_type = check_dicom_compression(dicom)
         if is_compressed:
@@ -1036,8 +1891,17 @@ def process_dicom_file(file_path: str, key: str, crc: str):
         number_of_frames = max(1, dicom.get("NumberOfFrames", 1))
         logger.info(f"Number of frames: {number_of_frames}")
 
+        # Compressed multi-frame files (and baseline JPEG that may be served as
+        # stored): only the header and offset table are parsed here, frames are
+        # decoded one at a time when first requested
+        if ENCAPSULATED_FRAME_DECODE and is_compressed and EncapsulatedFrameSource.supports(dicom) and (
+                number_of_frames > 1 or (JPEG_PASSTHROUGH and dicom.file_meta.TransferSyntaxUID == JPEG_BASELINE)):
+            response = ingest_encapsulated_frames(file_path, key, crc, dicom, dicom_bytes, number_of_frames, compression_type)
+            if response is not None:
+                return response
+
         # Attempt to get pixel data with fallbacks
-        pixels = decompress_dicom_with_fallbacks(dicom, file_path)
+        pixels = decompress_dicom_with_fallbacks(dicom, dicom_bytes)
 
         if pixels is None:
             error_msg = f"Failed to decompress DICOM file with {compression_type} compression. "
@@ -1060,6 +1924,7 @@ def process_dicom_file(file_path: str, key: str, crc: str):
             )
 
         logger.info(f"Successfully extracted pixel data. Shape: {pixels.shape}")
+        raw_pixels = pixels
 
         # Apply windowing
         try:
@@ -1082,6 +1947,11 @@ def process_dicom_file(file_path: str, key: str, crc: str):
         stored_images[key]["timestamp"] = time.time()
         stored_images[key]["crc"] = crc
 
+        # Keep the pre-window pixels for interactive window/level re-rendering
+        stored_images[key]["spacing"] = get_dicom_spacing(dicom)
+        if RETAIN_RAW_VOLUME:
+            retain_raw_volume(stored_images[key], raw_pixels, get_dicom_window(dicom), int(dicom.get("SamplesPerPixel", 1)))
+
         # Detect if this is likely an OCT image (multi-frame with depth)
         is_oct_image = False
         middle_frame_pixels = None
@@ -1111,31 +1981,33 @@ def process_dicom_file(file_path: str, key: str, crc: str):
         # Initialize storage for this key
 
 
-        # Process each frame
-        logger.info(f"Processing {number_of_frames} frame(s)")
-        for frame in range(number_of_frames):
-            try:
-                img = convert_dicom_to_image(pixels, frame)
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='JPEG', quality=95)
-                img_byte_arr.seek(0)
-                stored_images[key][frame] = img_byte_arr
-                logger.debug(f"Processed frame {frame + 1}/{number_of_frames}")
-            except Exception as e:
-                logger.error(f"Failed to process frame {frame}: {str(e)}")
-                raise
+        if LAZY_FRAME_RENDERING:
+            # Keep only the windowed volume; frames are encoded on first request
+            # and the disk cache keeps the volume itself
+            stored_images[key]["volume"] = pixels
+            stored_images[key]["number_of_frames"] = number_of_frames
+            logger.info(f"Deferred encoding of {number_of_frames} frame(s) until requested")
+            frame_keys, layout = {}, lazy_cache_layout(stored_images[key])
+        else:
+            # Process each frame (encoded in parallel, middle frame first) and
+            # publish every frame as soon as it is encoded
+            order = priority_order(number_of_frames)
+            announce_frames(key, number_of_frames, order[0])
+            logger.info(f"Processing {number_of_frames} frame(s)")
+            encode_frames(pixels, number_of_frames, order=order,
+                          on_frame=lambda frame, buf: publish_frame(key, frame, buf))
+            frame_keys, layout = {k: k for k in stored_images[key] if isinstance(k, int)}, None
 
         # Save to hierarchical CRC-based cache
         try:
-            cache_data = {k: v for k, v in stored_images[key].items() if isinstance(k, int)}
             file_info = {
                 "name": os.path.basename(file_path),
-                "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
+                "size": len(dicom_bytes),
                 "compression_type": compression_type,
                 "is_compressed": is_compressed
             }
-            save_to_cache(crc, cache_data, "dicom", file_info)
-            logger.info(f"Saved processed DICOM images to CRC cache: {crc}")
+            queue_cache_write(key, crc, frame_keys, "dicom", file_info, layout=layout)
+            logger.info(f"Queued processed DICOM images for the CRC cache: {crc}")
         except Exception as e:
             logger.warning(f"Failed to save to CRC cache: {str(e)}")
 
@@ -1331,16 +2203,23 @@ def process_e2e_file(file_path: str, key: str, crc: str):
                         flattened_oct_key = f"{key}_{laterality}_oct_flattened_{i}"
                         flattened_img_byte_arr = io.BytesIO()
 
-                        # Apply OCT flattening and get numpy array result
-                        flattened_oct_array = apply_oct_flattening(oct_slice, is_middle_frame=True)
-
-                        # Convert flattened numpy array to PIL Image
-                        if isinstance(flattened_oct_array, np.ndarray):
-                            flattened_pil_image = Image.fromarray(flattened_oct_array)
+                        flattened_params = {"laterality": laterality, "volume": i, "frame": middle_frame_index}
+                        flattened_jpeg = DERIVED_ARTIFACT_CACHE.get(crc, "e2e_flatten", flattened_params)
+                        if flattened_jpeg is not None:
+                            flattened_img_byte_arr.write(flattened_jpeg)
                         else:
-                            flattened_pil_image = flattened_oct_array
-
-                        flattened_pil_image.save(flattened_img_byte_arr, format='JPEG', quality=95)
+                            # Apply OCT flattening and get numpy array result
+                            flattened_oct_array = apply_oct_flattening(oct_slice, is_middle_frame=True)
+
+                            # Convert flattened numpy array to PIL Image
+                            if isinstance(flattened_oct_array, np.ndarray):
+                                flattened_pil_image = Image.fromarray(flattened_oct_array)
+                            else:
+                                flattened_pil_image = flattened_oct_array
+
+                            flattened_pil_image.save(flattened_img_byte_arr, format='JPEG', quality=95)
+                            DERIVED_ARTIFACT_CACHE.put(crc, "e2e_flatten", flattened_params,
+                                                       flattened_img_byte_arr.getvalue(), "image/jpeg")
                         flattened_img_byte_arr.seek(0)
 
                         stored_images[key][flattened_oct_key] = flattened_img_byte_arr
@@ -1358,16 +2237,22 @@ def process_e2e_file(file_path: str, key: str, crc: str):
         # Save to CRC-based cache
         try:
             # Create cache data for all processed images - fix the data structure
-            cache_data = {}
+            frame_keys = {}
             frame_counter = 0
             for img_key, img_data in stored_images[key].items():
                 if isinstance(img_data, io.BytesIO):
-                    cache_data[frame_counter] = img_data
+                    frame_keys[frame_counter] = img_key
                     frame_counter += 1
 
-            if cache_data:
-                save_to_cache(crc, cache_data, "e2e", {})
-                logger.info(f"Saved E2E processed images to CRC cache: {crc}")
+            if frame_keys:
+                # Image names are kept relative to the key, with the per-eye
+                # lists, so the entry can be rebuilt from the cache
+                layout = {"kind": "e2e", "names": [frame_keys[i][len(key):] for i in range(len(frame_keys))]}
+                for eye_key in ("left_eye_data", "right_eye_data"):
+                    layout[eye_key] = {kind: [name[len(key):] for name in names]
+                                       for kind, names in stored_images[key][eye_key].items()}
+                queue_cache_write(key, crc, frame_keys, "e2e", {}, layout=layout)
+                logger.info(f"Queued E2E processed images for the CRC cache: {crc}")
         except Exception as e:
             logger.warning(f"Failed to save E2E to CRC cache: {str(e)}")
 
@@ -1409,24 +2294,37 @@ def process_fds_file(file_path: str, key: str, crc: str):
 
 # Add OCT flattening functionality
 @app.get("/api/flatten_dicom_image")
-async def flatten_dicom_image(dicom_file_path: str = Query(...)):
+async def flatten_dicom_image(request: Request, dicom_file_path: str = Query(...)):
     """
     Enhanced flattening with better error handling and fallback methods.
     """
     logger.info(f"Flattening request for file key: {dicom_file_path}")
 
     try:
-        if dicom_file_path not in stored_images:
+        headers = {"Cache-Control": REVALIDATE}
+        validators = entry_validators(dicom_file_path)
+        if validators is not None:
+            etag = strong_etag(validators[0], "flatten", ALGORITHM_VERSIONS["flatten"])
+            response = not_modified(request, etag, validators[1], REVALIDATE)
+            if response is not None:
+                return response
+            headers = cache_headers(etag, validators[1], REVALIDATE)
+
+        data = await load_stored_entry(dicom_file_path)
+        if data is None:
             raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
 
-        data = stored_images[dicom_file_path]
-
         # Check if already flattened and cached
         if "flattened_0" in data:
             logger.info(f"Serving cached flattened image for {dicom_file_path}")
-            image_buffer = data["flattened_0"]
-            image_buffer.seek(0)
-            return StreamingResponse(image_buffer, media_type="image/png")
+            return Response(content=data["flattened_0"].getvalue(), media_type="image/png", headers=headers)
+
+        # Flattened before, by this or another worker or before a restart
+        flattened_png = await run_in_threadpool(DERIVED_ARTIFACT_CACHE.get, data.get("crc"), "flatten")
+        if flattened_png is not None:
+            logger.info(f"Serving flattened image for {dicom_file_path} from the derived artifact cache")
+            data["flattened_0"] = io.BytesIO(flattened_png)
+            return Response(content=flattened_png, media_type="image/png", headers=headers)
 
         # Method 1: Check if this is an OCT image with stored middle frame
         if data.get("is_oct", False) and "middle_frame_pixels" in data:
@@ -1447,34 +2345,22 @@ async def flatten_dicom_image(dicom_file_path: str = Query(...)):
         elif "dicom_bytes" in data and data["dicom_bytes"] is not None:
             logger.info(f"Processing flattening using stored DICOM bytes for {dicom_file_path}")
 
-            # Create a temporary file from the stored bytes
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.dcm') as tmp:
-                tmp.write(data["dicom_bytes"])
-                temp_dicom_path = tmp.name
-
-            try:
-                # Read the DICOM file for flattening
-                dicom = pydicom.dcmread(temp_dicom_path, force=True)
-                pixels = decompress_dicom_with_fallbacks(dicom, temp_dicom_path)
-
-                if pixels is None:
-                    raise HTTPException(status_code=500, detail="Failed to extract pixel data for flattening")
+            # Parse the stored bytes in memory for flattening
+            dicom = pydicom.dcmread(io.BytesIO(data["dicom_bytes"]), force=True)
+            pixels = decompress_dicom_with_fallbacks(dicom, data["dicom_bytes"])
 
-                # Apply OCT flattening algorithm
-                flattened_pixels = apply_oct_flattening(pixels, is_middle_frame=False)
+            if pixels is None:
+                raise HTTPException(status_code=500, detail="Failed to extract pixel data for flattening")
 
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_dicom_path):
-                    os.remove(temp_dicom_path)
+            # Apply OCT flattening algorithm
+            flattened_pixels = apply_oct_flattening(pixels, is_middle_frame=False)
 
         # Method 3: Fallback - try to reconstruct from stored frame data
         else:
             logger.info(f"Using fallback method: reconstructing from frame data for {dicom_file_path}")
 
             # Get available frames
-            frame_keys = [k for k in data.keys() if isinstance(k, int)]
+            frame_keys = get_frame_numbers(data)
             if not frame_keys:
                 raise HTTPException(status_code=400, detail="No frame data available for flattening")
 
@@ -1487,7 +2373,10 @@ async def flatten_dicom_image(dicom_file_path: str = Query(...)):
             logger.info(f"Using frame {middle_frame_key} for fallback flattening")
 
             # Get the frame image data
-            frame_buffer = data[middle_frame_key]
+            if middle_frame_key in data:
+                frame_buffer = data[middle_frame_key]
+            else:
+                frame_buffer = io.BytesIO(render_frame(dicom_file_path, data, middle_frame_key))
             frame_buffer.seek(0)
 
             # Convert JPEG buffer back to numpy array
@@ -1515,10 +2404,10 @@ async def flatten_dicom_image(dicom_file_path: str = Query(...)):
 
         # Cache the result
         data["flattened_0"] = flattened_buffer
+        DERIVED_ARTIFACT_CACHE.put(data.get("crc"), "flatten", None, flattened_buffer.getvalue(), "image/png")
 
         # Return the flattened image
-        flattened_buffer.seek(0)
-        return StreamingResponse(flattened_buffer, media_type="image/png")
+        return Response(content=flattened_buffer.getvalue(), media_type="image/png", headers=headers)
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -1529,17 +2418,22 @@ async def flatten_dicom_image(dicom_file_path: str = Query(...)):
 
 # NEW ENDPOINT: Get frame information for multi-frame DICOM - FIXED for single-frame support
 @app.get("/api/view_frames/{file_key}")
-async def view_frames(file_key: str):
-    """Get information about all frames in a DICOM file - supports both single and multi-frame."""
+async def view_frames(file_key: str, manifest: bool = Query(False)):
+    """
+    Get information about all frames in a DICOM file - supports both single and multi-frame.
+
+    With manifest=true the response also lists every frame's byte size (None
+    until a lazily rendered frame is first encoded) and ETag, so clients can
+    plan prefetching and batch requests.
+    """
     logger.info(f"Getting frame info for file key: {file_key}")
 
     try:
-        if file_key not in stored_images:
+        frames_data = await load_stored_entry(file_key)
+        if frames_data is None:
             raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
-
-        frames_data = stored_images[file_key]
-        # Count only integer keys (frames), exclude metadata keys
-        frame_keys = [k for k in frames_data.keys() if isinstance(k, int)]
+        # Count only frames, exclude metadata keys
+        frame_keys = get_frame_numbers(frames_data)
         number_of_frames = len(frame_keys)
 
         # Ensure we have at least 1 frame
@@ -1549,37 +2443,137 @@ async def view_frames(file_key: str):
 
         # Return frame URLs/info - works for both single and multi-frame
         frame_urls = []
-        for frame_num in sorted(frame_keys):
+        for frame_num in frame_keys:
             frame_urls.append(f"/api/view_dicom_png?frame={frame_num}&dicom_file_path={file_key}")
 
         logger.info(f"Returning {number_of_frames} frame(s) for file key: {file_key}")
 
-        return {
+        frame_info = {
             "number_of_frames": number_of_frames,
             "frame_urls": frame_urls,
             "file_key": file_key
         }
+        if manifest:
+            crc = frames_data.get("crc")
+            frame_info["batch_url"] = f"/api/view_frames/{file_key}/batch"
+            frame_info["frames"] = [
+                {
+                    "frame": frame_num,
+                    "bytes": frame_size(frames_data, frame_num),
+                    "etag": frame_etag(crc, frame_num) if crc else None,
+                    "url": url
+                }
+                for frame_num, url in zip(frame_keys, frame_urls)
+            ]
+        return frame_info
 
     except Exception as e:
         logger.error(f"Error getting frame info: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting frame info: {str(e)}")
 
+@app.get("/api/view_frames/{file_key}/batch")
+async def view_frames_batch(request: Request, file_key: str, frames: Optional[str] = Query(None),
+                            start: Optional[int] = Query(None), end: Optional[int] = Query(None),
+                            bundle_format: str = Query("bundle", alias="format"), size: str = Query("full"),
+                            fmt: Optional[str] = Query(None), q: Optional[int] = Query(None)):
+    """
+    Serve many frames in one response.
+
+    Frames are given as a list with ranges (frames=0,4,10-15) or as
+    start..end inclusive, and returned in the requested order, either as a
+    length-prefixed bundle with a JSON index (format=bundle, see
+    riv_desktop.frame_bundle) or as multipart/mixed (format=multipart).
+    Frames outside the volume are listed under "missing" in the bundle index.
+    size=preview returns low-resolution frames; fmt and q pick the frame
+    format and quality.
+    """
+    try:
+        frame_numbers = parse_frame_list(frames, start, end, limit=FRAME_BATCH_MAX)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid frame list: {str(e)}. frames must be a "
+                                                    "comma-separated list of frame numbers or ranges.")
+    if not frame_numbers:
+        raise HTTPException(status_code=400, detail="No frames requested.")
+    if bundle_format not in ("bundle", "multipart"):
+        raise HTTPException(status_code=400, detail="format must be bundle or multipart.")
+    variant = resolve_frame_variant(size, fmt, q)
+    logger.info(f"Batch request for {len(frame_numbers)} frame(s) of {file_key}")
+
+    try:
+        etag, last_modified = None, None
+        validators = entry_validators(file_key)
+        if validators is not None:
+            etag = strong_etag(validators[0], "batch", frame_numbers, bundle_format,
+                               [frame_etag(validators[0], frame, variant) for frame in frame_numbers])
+            last_modified = validators[1]
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+
+        data = await load_stored_entry(file_key)
+        if data is None:
+            raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
+
+        def collect():
+            found, missing = [], []
+            crc = data.get("crc")
+            for frame in frame_numbers:
+                encoded = get_frame_variant((crc or file_key, frame), lambda: get_frame_bytes(file_key, data, frame),
+                                            variant, lambda: lazy_frame_pixels(data, frame))
+                if encoded is None:
+                    missing.append(frame)
+                else:
+                    found.append((frame, encoded, frame_etag(crc, frame, variant) if crc else None))
+            return found, missing
+
+        # Lazily ingested frames may have to be encoded - off the event loop
+        found, missing = await run_in_threadpool(collect)
+        if not found:
+            raise HTTPException(status_code=404, detail="None of the requested frames were found.")
+
+        headers = cache_headers(etag, last_modified) if etag else {"Cache-Control": IMMUTABLE}
+        if bundle_format == "multipart":
+            body, media_type = pack_multipart(found, variant_media_type(variant))
+        else:
+            body = pack_bundle(found, variant_media_type(variant), file_key=file_key, missing=missing)
+            media_type = BUNDLE_MEDIA_TYPE
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving frame batch for {file_key}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error serving frames: {str(e)}")
+
 @app.get("/api/view_e2e_eye")
-async def view_e2e_eye(frame: int = Query(...), dicom_file_path: str = Query(...), eye: str = Query(...)):
+async def view_e2e_eye(request: Request, frame: int = Query(...), dicom_file_path: str = Query(...),
+                       eye: str = Query(...), size: str = Query("full"), fmt: Optional[str] = Query(None),
+                       q: Optional[int] = Query(None)):
     logger.info(f"Received request to view E2E frame {frame} from file {dicom_file_path} for {eye} eye")
+    variant = resolve_frame_variant(size, fmt, q, request.headers.get("accept"))
 
     try:
-        if dicom_file_path not in stored_images:
-            raise HTTPException(status_code=404, detail="E2E file not found in memory.")
+        # Get the appropriate eye data
+        eye_key = "left_eye_data" if eye.lower() == "left" else "right_eye_data"
 
-        data = stored_images[dicom_file_path]
+        headers = {"Cache-Control": REVALIDATE}
+        validators = entry_validators(dicom_file_path)
+        if validators is not None:
+            etag = strong_etag(validators[0], "e2e", eye_key, frame, ALGORITHM_VERSIONS["e2e_flatten"],
+                               variant_etag_part(variant))
+            response = not_modified(request, etag, validators[1], REVALIDATE, variant)
+            if response is not None:
+                return response
+            headers = cache_headers(etag, validators[1], REVALIDATE)
+        variant_headers(headers, variant)
+
+        data = await load_stored_entry(dicom_file_path)
+        if data is None:
+            raise HTTPException(status_code=404, detail="E2E file not found in memory.")
 
         if data.get("file_type") != "e2e":
             raise HTTPException(status_code=400, detail="File is not an E2E file.")
 
-        # Get the appropriate eye data
-        eye_key = "left_eye_data" if eye.lower() == "left" else "right_eye_data"
-
         if eye_key not in data:
             raise HTTPException(status_code=404, detail=f"No data found for {eye} eye.")
 
@@ -1596,10 +2590,9 @@ async def view_e2e_eye(frame: int = Query(...), dicom_file_path: str = Query(...
         if frame_key not in data:
             raise HTTPException(status_code=404, detail=f"Frame data '{frame_key}' not found.")
 
-        buf = data[frame_key]
-        buf.seek(0)
-
-        return StreamingResponse(buf, media_type="image/jpeg")
+        encoded = await run_in_threadpool(get_frame_variant, (data.get("crc") or dicom_file_path, frame_key),
+                                          data[frame_key].getvalue, variant)
+        return Response(content=encoded, media_type=variant_media_type(variant), headers=headers)
 
     except HTTPException as e:
         logger.error(f"Error retrieving E2E frame {frame} for {eye} eye: {str(e)}")
@@ -1614,11 +2607,10 @@ async def get_e2e_tree_data(dicom_file_path: str = Query(...)):
     logger.info(f"Getting E2E tree data for {dicom_file_path}")
 
     try:
-        if dicom_file_path not in stored_images:
+        data = await load_stored_entry(dicom_file_path)
+        if data is None:
             raise HTTPException(status_code=404, detail="E2E file not found in memory.")
 
-        data = stored_images[dicom_file_path]
-
         if data.get("file_type") != "e2e":
             raise HTTPException(status_code=400, detail="File is not an E2E file.")
 
@@ -1638,45 +2630,213 @@ async def get_e2e_tree_data(dicom_file_path: str = Query(...)):
             "file_type": "e2e"
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting E2E tree data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting tree data: {str(e)}")
 
 @app.get("/api/view_dicom_png")
-async def view_dicom_png(frame: int = Query(...), dicom_file_path: str = Query(...), v: str = Query(None)):
-    """Serve a specific frame from the preprocessed DICOM file stored in memory with CRC-based caching."""
+async def view_dicom_png(request: Request, frame: int = Query(...), dicom_file_path: str = Query(...),
+                         v: str = Query(None), size: str = Query("full"), fmt: Optional[str] = Query(None),
+                         q: Optional[int] = Query(None)):
+    """
+    Serve a specific frame from the preprocessed DICOM file stored in memory with CRC-based caching.
+
+    The ETag is derived from the file's content fingerprint, so a revalidation
+    is answered with a 304 before the frame is looked up. size=preview serves
+    a low-resolution version of the frame; fmt (jpeg, pjpeg, webp, png) and q
+    pick another format and quality. Without fmt the stored JPEG is served,
+    unless FRAME_FORMAT_NEGOTIATION is on and the Accept header prefers
+    another format.
+    """
     logger.info(f"Received request to view DICOM PNG for frame {frame} from file {dicom_file_path}")
     logger.info(f"CRC version parameter: {v}")
     logger.info(f"Stored images in memory: {len(stored_images)} entries")
+    variant = resolve_frame_variant(size, fmt, q, request.headers.get("accept"))
 
     try:
-        if dicom_file_path not in stored_images:
+        etag, last_modified = None, None
+        validators = entry_validators(dicom_file_path)
+        if validators is not None:
+            etag = frame_etag(validators[0], frame, variant)
+            last_modified = validators[1]
+            response = not_modified(request, etag, last_modified, variant=variant)
+            if response is not None:
+                return response
+
+        data = await load_stored_entry(dicom_file_path)
+        if data is None:
             raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
         logger.info(f"Retrieving frame {frame} from DICOM file {dicom_file_path}")
 
-        if frame not in stored_images[dicom_file_path]:
-            raise HTTPException(status_code=404, detail="Frame not found.")
+        if not is_stored_variant(variant):
+            encoded = await run_in_threadpool(get_frame_variant, (data.get("crc") or dicom_file_path, frame),
+                                              lambda: get_frame_bytes(dicom_file_path, data, frame), variant,
+                                              lambda: lazy_frame_pixels(data, frame))
+            if encoded is None:
+                raise HTTPException(status_code=404, detail="Frame not found.")
+        elif frame in data:
+            encoded = data[frame].getvalue()
+        else:
+            # Lazily ingested volumes are encoded on first request (off the event loop)
+            encoded = await run_in_threadpool(render_frame, dicom_file_path, data, frame)
+            if encoded is None:
+                raise HTTPException(status_code=404, detail="Frame not found.")
         logger.info(f"Frame {frame} found in stored images for {dicom_file_path}")
 
-        buf = stored_images[dicom_file_path][frame]
-        logger.info(f"Buffer size for frame {frame}: {buf.getbuffer().nbytes} bytes")
-        buf.seek(0)
+        logger.info(f"Buffer size for frame {frame}: {len(encoded)} bytes")
         logger.info(f"Returning frame {frame} as PNG response")
 
         # Set CRC-based cache headers for browser caching
+        headers = cache_headers(etag, last_modified) if etag else {"Cache-Control": IMMUTABLE}
+
+        return Response(content=encoded, media_type=variant_media_type(variant),
+                        headers=variant_headers(headers, variant))
+
+    except Exception as e:
+        logger.error(f"Error retrieving DICOM frame {frame}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing DICOM file: {str(e)}")
+
+@app.get("/api/volume/{key}")
+async def stream_volume(request: Request, key: str):
+    """
+    Stream the decoded pixel volume of a DICOM entry as raw little-endian samples.
+
+    The body is the (frames, rows, columns[, samples]) array in C order, sent
+    one frame at a time; shape, dtype and spacing (mm, between slices / rows /
+    columns) come in X-Volume-* headers. It is compressed on the fly with
+    zstd or gzip when Accept-Encoding allows (sent chunked), and a single
+    byte Range is served uncompressed with 206. The source is the raw volume
+    retained at ingest or, for compressed multi-frame files, frames decoded
+    from the frame source as they are streamed.
+    """
+    logger.info(f"Volume request for {key}")
+
+    try:
+        range_header = request.headers.get("range")
+        encoding = "identity" if range_header else choose_encoding(request.headers.get("accept-encoding"))
+        etag, last_modified = None, None
+        validators = entry_validators(key)
+        if validators is not None:
+            etag = strong_etag(validators[0], "volume", encoding)
+            last_modified = validators[1]
+            if not range_header:
+                response = not_modified(request, etag, last_modified)
+                if response is not None:
+                    return response
+
+        data = await load_stored_entry(key)
+        if data is None:
+            raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
+
+        source = data.get("frame_source")
+        raw_volume = data.get("raw_volume") if source is not None else await run_in_threadpool(load_raw_volume, key, data)
+        if raw_volume is not None:
+            # A frame stack already: frames first, colour samples last
+            number_of_frames, frame_shape, dtype = raw_volume.shape[0], raw_volume.shape[1:], raw_volume.dtype
+            get_frame = raw_volume.__getitem__
+        elif source is not None:
+            first = await run_in_threadpool(source.decode, 0)
+            number_of_frames, frame_shape, dtype = source.number_of_frames, first.shape, first.dtype
+            get_frame = source.decode
+        else:
+            raise HTTPException(status_code=404, detail="Raw pixel data not available for this file.")
+
+        frame_nbytes = int(np.prod(frame_shape)) * dtype.itemsize
+        total = number_of_frames * frame_nbytes
+        try:
+            byte_range = parse_range(range_header, total)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Range not satisfiable.",
+                                headers={"Content-Range": f"bytes */{total}"})
+        if byte_range is None and range_header:
+            # Range this endpoint does not serve (e.g. several ranges): send the whole volume
+            encoding = choose_encoding(request.headers.get("accept-encoding"))
+            etag = strong_etag(validators[0], "volume", encoding) if validators is not None else None
+
+        spacing = data.get("spacing")
         headers = {
-            "Cache-Control": "public, max-age=31536000, immutable",
-            "ETag": f'"{v}"' if v else None
+            "X-Volume-Shape": ",".join(str(n) for n in (number_of_frames, *frame_shape)),
+            "X-Volume-Dtype": dtype.name,
+            "X-Volume-Byte-Order": "little",
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+            "Access-Control-Expose-Headers": "X-Volume-Shape, X-Volume-Dtype, X-Volume-Byte-Order, X-Volume-Spacing"
         }
+        if spacing is not None:
+            headers["X-Volume-Spacing"] = ",".join("" if v is None else str(v) for v in spacing)
+        if etag is not None:
+            headers.update(cache_headers(etag, last_modified))
+
+        status_code = 200
+        start, end = 0, total - 1
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+            headers["Content-Length"] = str(end - start + 1)
+        elif encoding == "identity":
+            headers["Content-Length"] = str(total)
+        else:
+            # Compressed size is not known up front, so the response is sent chunked
+            headers["Content-Encoding"] = encoding
+
+        chunks = iter_volume(get_frame, number_of_frames, frame_nbytes, start, end)
+        return StreamingResponse(encode_stream(chunks, encoding), status_code=status_code,
+                                 media_type="application/octet-stream", headers=headers)
 
-        # Remove None values from headers
-        headers = {k: v for k, v in headers.items() if v is not None}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming volume for {key}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error streaming volume: {str(e)}")
+
+@app.get("/api/render_frame")
+async def render_frame_with_window(request: Request, key: str = Query(...), frame: int = Query(...),
+                                   wc: Optional[float] = Query(None), ww: Optional[float] = Query(None),
+                                   size: str = Query("full"), fmt: Optional[str] = Query(None),
+                                   q: Optional[int] = Query(None)):
+    """Re-render a frame from the retained raw volume with a custom window center/width."""
+    logger.info(f"Render request for frame {frame} of {key} (WC={wc}, WW={ww})")
+    variant = resolve_frame_variant(size, fmt, q, request.headers.get("accept"))
+
+    if (wc is None) != (ww is None):
+        raise HTTPException(status_code=400, detail="wc and ww must be given together.")
+    if ww is not None and ww <= 0:
+        raise HTTPException(status_code=400, detail="ww must be positive.")
 
-        return StreamingResponse(buf, media_type="image/jpeg", headers=headers)
+    try:
+        etag, last_modified = None, None
+        validators = entry_validators(key)
+        if validators is not None:
+            etag = strong_etag(validators[0], "window", frame, wc, ww, ALGORITHM_VERSIONS["window"], FRAME_ETAG_SETTINGS,
+                               variant_etag_part(variant))
+            last_modified = validators[1]
+            response = not_modified(request, etag, last_modified, variant=variant)
+            if response is not None:
+                return response
+
+        data = await load_stored_entry(key)
+        if data is None:
+            raise HTTPException(status_code=404, detail="DICOM file not found in memory.")
 
+        encoded = await run_in_threadpool(get_frame_variant, (data.get("crc") or key, frame, wc, ww),
+                                          lambda: render_windowed_frame(key, data, frame, wc, ww), variant,
+                                          lambda: window_frame_pixels(key, data, frame, wc, ww))
+        if encoded is None:
+            if data.get("raw_volume") is None and data.get("frame_source") is None:
+                raise HTTPException(status_code=404, detail="Raw pixel data not available for this file.")
+            raise HTTPException(status_code=404, detail="Frame not found.")
+
+        headers = cache_headers(etag, last_modified) if etag else {"Cache-Control": IMMUTABLE}
+        return Response(content=encoded, media_type=variant_media_type(variant), headers=variant_headers(headers, variant))
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error retrieving DICOM frame {frame}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error processing DICOM file: {str(e)}")
+        logger.error(f"Error rendering frame {frame}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error rendering frame: {str(e)}")
 
 def extract_all_dicom_metadata(dicom_files):
     """Extract all available metadata from DICOM files, excluding pixel data."""
@@ -1728,39 +2888,12 @@ def process_fda_file(file_path: str, key: str, crc: str):
         - JSON response
     """
     try:
-        # Check CRC-based cache first
-        cache_path = get_cache_path(crc)
-        if cache_path.exists():
-            logger.info(f"Loading from CRC cache: {crc}")
-            cached_images, metadata = load_from_cache(crc)
-
-            if cached_images:  # Only proceed if we have cached images
-                # FIXED: Properly restore all frames from cache
-                stored_images[key] = {}
-
-                # Restore all cached frames
-                for frame_num, img_data in cached_images.items():
-                    stored_images[key][frame_num] = img_data
-
-                # Store timestamp and CRC for cache management
-                stored_images[key]["timestamp"] = time.time()
-                stored_images[key]["crc"] = crc
-
-                # FIXED: Get the correct number of frames from cache
-                number_of_frames = len(cached_images)
-
-                # Clean up temporary file
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-
-                logger.info(f"Successfully loaded {number_of_frames} frames from CRC cache")
-
-                return JSONResponse(content={
-                    "message": "File loaded from CRC cache.",
-                    "number_of_frames": number_of_frames,
-                    "dicom_file_path": key,
-                    "cache_source": "disk"
-                })
+        # Check the cache index first
+        cache_path = find_cache_entry(crc, "fda")
+        if cache_path is not None:
+            response = load_cache_hit(key, crc, cache_path, file_path)
+            if response is not None:
+                return response
 
         # continue with first time processing
         fda = FDA(file_path)
@@ -1776,10 +2909,8 @@ def process_fda_file(file_path: str, key: str, crc: str):
         per_frame = []
         pixel_data_bytes = list() # TODO
 
-        # Normalize
-        frames = normalize_volume(oct.volume)
-
-        pixel_data = np.array(frames).astype(np.uint16)
+        # Normalize to 0-100 and quantize, as FDA frames have always been shown
+        pixel_data = np.array(normalize_volume(oct.volume)).astype(np.uint16)
 
         if pixel_data is None:
             error_msg = f"Failed to convert fda to dicom."
@@ -1797,19 +2928,12 @@ def process_fda_file(file_path: str, key: str, crc: str):
             )
 
         logger.info(f"Successfully extracted pixel data. Shape: {pixel_data.shape}")
+        raw_pixel_data = pixel_data
 
-        # Apply windowing to fda file
+        # Apply windowing to fda file - stretch the quantized volume's min/max
+        # range straight to uint8 through a lookup table
         try:
-            pixel_data = pixel_data.astype(np.float64)
-            pixels_min = pixel_data.min()
-            pixels_max = pixel_data.max()
-
-            if pixels_max > pixels_min:
-                pixel_data = (pixel_data - pixels_min) / (pixels_max - pixels_min) * 255.0
-            else:
-                pixel_data = np.full_like(pixel_data, 128.0)
-
-            pixel_data = pixel_data.astype(np.uint8)
+            pixel_data = auto_window(pixel_data)
             logger.info(f"Windowing applied successfully")
         except Exception as fallback_error:
             logger.error(f"Even fallback normalization failed: {str(fallback_error)}")
@@ -1826,31 +2950,37 @@ def process_fda_file(file_path: str, key: str, crc: str):
         stored_images[key]["timestamp"] = time.time()
         stored_images[key]["crc"] = crc
 
-        # Process each frame
-        logger.info(f"Processing {number_of_frames} frame(s)")
-        for frame in range(number_of_frames):
-            try:
-                img = convert_dicom_to_image(pixel_data, frame)
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='JPEG', quality=95)
-                img_byte_arr.seek(0)
-                stored_images[key][frame] = img_byte_arr
-                logger.debug(f"Processed frame {frame + 1}/{number_of_frames}")
-            except Exception as e:
-                logger.error(f"Failed to process frame {frame}: {str(e)}")
-                raise
+        # Keep the pre-window pixels for interactive window/level re-rendering
+        if RETAIN_RAW_VOLUME:
+            retain_raw_volume(stored_images[key], raw_pixel_data, None)
+
+        if LAZY_FRAME_RENDERING:
+            # Keep only the windowed volume; frames are encoded on first request
+            # and the disk cache keeps the volume itself
+            stored_images[key]["volume"] = pixel_data
+            stored_images[key]["number_of_frames"] = number_of_frames
+            logger.info(f"Deferred encoding of {number_of_frames} frame(s) until requested")
+            frame_keys, layout = {}, lazy_cache_layout(stored_images[key])
+        else:
+            # Process each frame (encoded in parallel, middle frame first) and
+            # publish every frame as soon as it is encoded
+            order = priority_order(number_of_frames)
+            announce_frames(key, number_of_frames, order[0])
+            logger.info(f"Processing {number_of_frames} frame(s)")
+            encode_frames(pixel_data, number_of_frames, order=order,
+                          on_frame=lambda frame, buf: publish_frame(key, frame, buf))
+            frame_keys, layout = {k: k for k in stored_images[key] if isinstance(k, int)}, None
 
         # Save to hierarchical CRC-based cache
         try:
-            cache_data = {k: v for k, v in stored_images[key].items() if isinstance(k, int)}
             file_info = {
                 "name": os.path.basename(file_path),
                 "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
                 "compression_type": compression_type,
                 "is_compressed": is_compressed
             }
-            save_to_cache(crc, cache_data, "fda", file_info)
-            logger.info(f"Saved processed FDA images to CRC cache: {crc}")
+            queue_cache_write(key, crc, frame_keys, "fda", file_info, layout=layout)
+            logger.info(f"Queued processed FDA images for the CRC cache: {crc}")
         except Exception as e:
             logger.warning(f"Failed to save to CRC cache: {str(e)}")
 
@@ -1911,24 +3041,38 @@ async def inspect_all_metadata(files: list[UploadFile] = File(...)):
         raise HTTPException(status_code=500, detail=f"Error processing DICOM files: {str(e)}")
 
 @app.get("/api/check_dicom_ready")
-async def check_dicom_ready(dicom_file_path: str):
+async def check_dicom_ready(dicom_file_path: str, frame: Optional[int] = None):
     """
     Check if the DICOM image for the given file path has been fully processed and is ready to be served.
+
+    Frames are published one by one while a file is ingested (middle frame
+    first), so per-frame progress is reported as well: frames_ready,
+    first_frame_ready and, when a frame is given, whether that frame can be
+    fetched already.
     """
     try:
-        # Check if the dicom_file_path exists in stored_images
-        if dicom_file_path in stored_images:
-            # Get the number of frames to confirm that all images are stored
-            number_of_frames = len([k for k in stored_images[dicom_file_path].keys() if isinstance(k, int)])
-
-            # If we have frames in memory, the DICOM is ready
-            if number_of_frames > 0:
-                return {
-                    "ready": True,
-                    "number_of_frames": number_of_frames
+        # Check if the dicom_file_path exists in stored_images (or the shared disk cache)
+        data = await load_stored_entry(dicom_file_path, count=False)
+        if data is not None:
+            frames_ready = get_frame_count(data)
+            number_of_frames = max(data.get("expected_frames", 0), frames_ready)
+
+            # If we have frames in memory, report how far ingestion has got
+            if frames_ready > 0:
+                first_frame = data.get("first_frame", 0)
+                status = {
+                    "ready": frames_ready >= number_of_frames,
+                    "number_of_frames": number_of_frames,
+                    "frames_ready": frames_ready,
+                    "progress": frames_ready / number_of_frames,
+                    "first_frame": first_frame,
+                    "first_frame_ready": is_frame_available(data, first_frame)
                 }
+                if frame is not None:
+                    status["frame_ready"] = is_frame_available(data, frame)
+                return status
         # If the DICOM is not fully processed, return not ready
-        return {"ready": False}
+        return {"ready": False, "frames_ready": 0}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking DICOM readiness: {str(e)}")
 
@@ -2167,12 +3311,197 @@ async def dicom_to_mat_npy_zip(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error processing DICOM file: {str(e)}")
     
 
+def get_ingest_file_type(ext: str) -> str:
+    """Cache file type for a file extension."""
+    return {".dcm": "dicom", ".dicom": "dicom", ".e2e": "e2e", ".fds": "fds", ".fda": "fda"}.get(ext, "unknown")
+
+def get_ingest_handler(ext: str):
+    """Return the processing function for a file extension, or None if unsupported."""
+    if ext in [".dcm", ".dicom"]:
+        return process_dicom_file
+    elif ext == ".e2e":
+        return process_e2e_file
+    elif ext == ".fds":
+        return process_fds_file
+    elif ext == ".fda":
+        return process_fda_file
+    return None
+
+def run_ingest_job(file_path: str, ext: str, key: str, crc: Optional[str] = None, legacy_keys=()) -> dict:
+    """
+    Process one file inside an ingest worker process.
+
+    The processing functions populate the worker's own stored_images, so the
+    entry is popped and handed back to the API process together with the
+    handler's JSON response. Only what the API process does not have yet is
+    returned: frames already sent as events are left out, and so is the frame
+    source of an encapsulated entry, which is rebuilt from its DICOM bytes.
+    HTTP errors are returned as plain data because HTTPException does not
+    survive pickling.
+
+    crc is the file's content fingerprint, computed here if not given.
+    legacy_keys are CRC32 keys the file may have been cached under before.
+    """
+    handler = get_ingest_handler(ext)
+    if handler is None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return {"ok": False, "status_code": 400, "detail": f"Unsupported file type: {ext}"}
+
+    try:
+        # DICOM files are read exactly once: when the fingerprint still has to
+        # be computed, the same buffer is handed on to the parser
+        file_bytes = None
+        legacy_keys = list(legacy_keys)
+        if crc is None:
+            if handler is process_dicom_file:
+                file_bytes = read_file_once(file_path)
+                fingerprint = fingerprint_bytes(file_bytes)
+            else:
+                fingerprint = fingerprint_file(file_path)
+            crc = fingerprint.hexdigest()
+            legacy_keys.append(fingerprint.legacy_crc())
+            logger.info(f"Calculated fingerprint: {crc}")
+
+        adopt_legacy_cache_entry(crc, legacy_keys, file_path)
+
+        if file_bytes is not None:
+            resp = handler(file_path, key, crc, file_bytes=file_bytes)
+        else:
+            resp = handler(file_path, key, crc)
+        published = PUBLISHED_FRAMES.get(key, ())
+        entry = {k: v for k, v in stored_images.pop(key, {}).items() if k not in published and k != "frame_source"}
+        return {
+            "ok": True,
+            "crc": crc,
+            "response": json.loads(resp.body),
+            "entry": entry,
+            "cache_write": PENDING_CACHE_WRITES.pop(key, None)
+        }
+    except HTTPException as e:
+        return {"ok": False, "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        logger.error(f"Ingest job failed for {file_path}: {str(e)}", exc_info=True)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return {"ok": False, "status_code": 500, "detail": f"Error processing file: {str(e)}"}
+    finally:
+        stored_images.pop(key, None)
+        PENDING_CACHE_WRITES.pop(key, None)
+        PUBLISHED_FRAMES.pop(key, None)
+
+def _finish_ingest_job(record: dict, outcome: dict):
+    """Install a finished job's entry into stored_images (runs in the API process)."""
+    if not outcome["ok"]:
+        record["error"] = outcome["detail"]
+        record["status_code"] = outcome["status_code"]
+        return None
+
+    key = record["meta"]["dicom_file_path"]
+    record["meta"]["crc"] = outcome["crc"]
+    if outcome["entry"].get("restore_from_cache"):
+        # Found in the disk cache by the worker: map it here
+        if restore_from_disk_cache(key, outcome["crc"], record["meta"]["file_type"]) is None:
+            record["error"] = "Cache entry could not be loaded."
+            record["status_code"] = 500
+            return None
+        CACHE_INDEX.map_key(key, outcome["crc"], record["meta"]["file_type"])
+        return outcome["response"]
+    if outcome["entry"].get("encapsulated"):
+        attach_frame_source(outcome["entry"])
+    with stored_images.lock:
+        entry = stored_images.setdefault(key, {})
+        entry.update(outcome["entry"])
+        entry["file_type"] = record["meta"]["file_type"]
+        stored_images.account(key)
+    # Lets the key be restored after a restart
+    CACHE_INDEX.map_key(key, outcome["crc"], entry["file_type"])
+    if outcome.get("cache_write"):
+        # Frames are served from memory already; the disk copy is written behind
+        submit_cache_write(key, entry, outcome["cache_write"])
+    else:
+        # The job may have written a new cache entry
+        CACHE_JANITOR.wake()
+    return outcome["response"]
+
+def _on_frames_expected(record: dict, payload: dict):
+    """Job event handler: an ingest worker announced the number of frames it will publish."""
+    with stored_images.lock:
+        entry = stored_images.setdefault(payload["key"], {})
+        entry["expected_frames"] = payload["number_of_frames"]
+        entry["first_frame"] = payload["first_frame"]
+    record["progress"].update({"frames_ready": 0, "number_of_frames": payload["number_of_frames"]})
+
+def _on_frame_published(record: dict, payload: dict):
+    """Job event handler: an ingest worker encoded a frame, serve it right away."""
+    with stored_images.lock:
+        entry = stored_images.setdefault(payload["key"], {})
+        entry[payload["frame"]] = io.BytesIO(payload["data"])
+    record["progress"]["frames_ready"] = get_frame_count(entry)
+
+def _on_decode_result(record: dict, payload: dict):
+    """Job event handler: aggregate decoder outcomes from ingest workers."""
+    DICOM_DECODERS.record(payload["transfer_syntax"], payload["backend"], payload["success"], payload["elapsed_ms"])
+
+INGEST_JOBS.on_event("frames_expected", _on_frames_expected)
+INGEST_JOBS.on_event("frame", _on_frame_published)
+INGEST_JOBS.on_event("decode", _on_decode_result)
+
+def submit_ingest_job(file_path: str, ext: str, key: str, crc: Optional[str] = None, source: str = None,
+                      legacy_keys=()) -> str:
+    """Queue a file for processing in the ingest pool and return the job ID."""
+    try:
+        return INGEST_JOBS.submit(
+            run_ingest_job, file_path, ext, key, crc, tuple(legacy_keys),
+            on_done=_finish_ingest_job,
+            meta={"file": source or file_path, "dicom_file_path": key, "crc": crc,
+                  "file_type": get_ingest_file_type(ext)}
+        )
+    except JobQueueFull as e:
+        if os.path.exists(file_path) and source is not None and file_path != source:
+            os.remove(file_path)
+        raise HTTPException(status_code=503, detail=f"Ingest queue is full, retry later: {str(e)}")
+
+def download_s3_to_temp(s3_key: str, ext: str):
+    """
+    Download an S3 object to a temporary file (blocking), fingerprinting it as
+    it is written. Returns the file path and the fingerprint.
+    """
+    obj = s3.get_object(Bucket=bucket_name, Key=s3_key)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+        fingerprint = copy_with_fingerprint(obj['Body'], tmp)
+        return tmp.name, fingerprint
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status of an ingestion job."""
+    record = INGEST_JOBS.get(job_id)
+    if record is None:
+        # Submitted through another API worker
+        record = await run_in_threadpool(CACHE_INDEX.load_job, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    return {
+        "job_id": record["job_id"],
+        "status": record["status"],
+        "file": record["meta"].get("file"),
+        "dicom_file_path": record["meta"].get("dicom_file_path"),
+        "crc": record["meta"].get("crc"),
+        "progress": record["progress"],
+        "submitted_at": record["submitted_at"],
+        "started_at": record["started_at"],
+        "finished_at": record["finished_at"],
+        "result": record["result"],
+        "error": record["error"]
+    }
+
 @app.post("/api/save-to-cache")
 async def save_to_cache_api(request: Request):
     """
-    Receives a list of file paths from the frontend, downloads/processes each,
-    and saves them to the cache using the correct handler.
-    Logs each step for traceability.
+    Receives a list of file paths from the frontend and queues an ingest job
+    for each one. Returns immediately with the job IDs; progress and the
+    resulting content fingerprint ("crc") are available from /api/jobs/{job_id}.
     """
     data = await request.json()
     files = data.get("files", [])
@@ -2185,56 +3514,41 @@ async def save_to_cache_api(request: Request):
             ext = os.path.splitext(file_path)[1].lower()
             key = str(uuid.uuid4())
 
+            if get_ingest_handler(ext) is None:
+                logger.error(f"Unsupported file type: {ext}")
+                raise Exception(f"Unsupported file type: {ext}")
+
             # Handle S3 files (if path is s3:// or not present locally)
             if (file_path.startswith("s3://") or (bucket_name and not os.path.exists(file_path))):
                 s3_key = file_path.replace("s3://", "")
                 if s3_key.startswith(bucket_name + "/"):
                     s3_key = s3_key[len(bucket_name) + 1:]
                 logger.info(f"Downloading {s3_key} from S3 bucket {bucket_name}")
-                obj = s3.get_object(Bucket=bucket_name, Key=s3_key)
-                file_bytes = obj['Body'].read()
-                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                    tmp.write(file_bytes)
-                    temp_path = tmp.name
-                local_file_path = temp_path
+                local_file_path, fingerprint = await run_in_threadpool(download_s3_to_temp, s3_key, ext)
                 logger.info(f"Downloaded to temp file: {local_file_path}")
+                crc, legacy_keys = fingerprint.hexdigest(), [fingerprint.legacy_crc()]
             else:
+                # Local files are fingerprinted in the ingest worker
                 local_file_path = file_path
+                crc, legacy_keys = None, []
 
-            # Calculate CRC for caching
-            crc = calculate_crc32(local_file_path)
-            logger.info(f"Calculated CRC32: {crc}")
-
-            # Call the correct processing function
-            if ext in [".dcm", ".dicom"]:
-                logger.info(f"Detected DICOM file: {local_file_path}")
-                resp = process_dicom_file(local_file_path, key, crc)
-            elif ext == ".e2e":
-                logger.info(f"Detected E2E file: {local_file_path}")
-                resp = process_e2e_file(local_file_path, key, crc)
-            elif ext == ".fda":
-                logger.info(f"Detected FDA file: {local_file_path}")
-                resp = process_fda_file(local_file_path, key, crc)
-            else:
-                # Clean up temp file if created
-                if local_file_path != file_path and os.path.exists(local_file_path):
-                    os.remove(local_file_path)
-                logger.error(f"Unsupported file type: {ext}")
-                raise Exception(f"Unsupported file type: {ext}")
-
-            logger.info(f"Successfully processed and cached: {file_path}")
+            job_id = submit_ingest_job(local_file_path, ext, key, crc, source=file_path, legacy_keys=legacy_keys)
+            logger.info(f"Queued ingest job {job_id} for: {file_path}")
 
             results.append({
                 "file": file_path,
-                "crc": crc,
-                "status": "cached",
-                "response": resp.body.decode() if hasattr(resp, "body") else str(resp)
+                "job_id": job_id,
+                "dicom_file_path": key,
+                "status": "queued"
             })
+        except HTTPException as e:
+            logger.error(f"Error processing file {file_path}: {e.detail}")
+            results.append({"file": file_path, "error": e.detail, "status": "error"})
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {str(e)}")
             results.append({"file": file_path, "error": str(e), "status": "error"})
 
-    logger.info(f"Batch save-to-cache complete. Results: {results}")
+    logger.info(f"Batch save-to-cache queued. Results: {results}")
     return {"status": "ok", "results": results}
 
 @app.get("/api/dicom_support_status")
@@ -2255,7 +3569,9 @@ async def dicom_support_status():
             "pylibjpeg": "pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg pylibjpeg-rle",
             "gdcm": "pip install gdcm",
             "opencv": "pip install opencv-python"
-        }
+        },
+        "decoders": list(DICOM_DECODERS.backends),
+        "decoder_stats": DICOM_DECODERS.stats()
     }
 
 def cleanup_temp_files(temp_files: list):
@@ -2269,29 +3585,116 @@ def cleanup_on_shutdown():
     stored_images.clear()
     print("Stored images cleared on shutdown.")
 
+@app.on_event("shutdown")
+def shutdown_ingest_jobs():
+    """Stop the ingest process pool when the server shuts down."""
+    INGEST_JOBS.shutdown()
+
+@app.on_event("startup")
+def start_cache_janitor():
+    """Start the background thread that keeps the disk cache within budget."""
+    CACHE_JANITOR.start()
+
+def warm_up_memory_cache(limit: int = CACHE_WARMUP_ENTRIES, by: str = CACHE_WARMUP_BY):
+    """
+    Restore the key -> entry mappings recorded in the cache index and preload
+    the hottest disk cache entries into the memory tier.
+
+    Every known key becomes reloadable on first request; the top entries are
+    loaded up front, as long as their size on disk still fits the memory
+    budget. Mapped containers are read into the page cache rather than left
+    to fault in on first request. Progress is kept in CACHE_WARMUP and
+    reported by /api/cache-status.
+    """
+    CACHE_WARMUP.update(status="running", started_at=time.time(), total=0, loaded=0, keys_restored=0)
+    try:
+        keys_by_fingerprint = {}
+        for key, fingerprint, file_type in CACHE_INDEX.key_mappings():
+            keys_by_fingerprint.setdefault(fingerprint, []).append(key)
+            with stored_images.lock:
+                if key not in stored_images and key not in stored_images.evicted:
+                    stored_images.evicted[key] = (fingerprint, file_type)
+                    CACHE_WARMUP["keys_restored"] += 1
+
+        hottest = [e for e in CACHE_INDEX.hottest(limit, by) if e["fingerprint"] in keys_by_fingerprint]
+        CACHE_WARMUP["total"] = len(hottest)
+        for entry in hottest:
+            if stored_images.max_bytes and stored_images.current_bytes + entry["size_bytes"] > stored_images.max_bytes:
+                logger.info("Cache warm-up stopped at the memory budget")
+                break
+            # The most recently issued key is the one clients are most likely to hold
+            key = keys_by_fingerprint[entry["fingerprint"]][0]
+            if key in stored_images:
+                continue
+            data = restore_from_disk_cache(key, entry["fingerprint"], entry["file_type"], touch=False)
+            if data is None:
+                continue
+            if "container" in data:
+                data["container"].preload()
+            CACHE_WARMUP["loaded"] += 1
+
+        CACHE_WARMUP["status"] = "done"
+        logger.info(f"Cache warm-up loaded {CACHE_WARMUP['loaded']} entries, restored {CACHE_WARMUP['keys_restored']} keys")
+    except Exception as e:
+        CACHE_WARMUP["status"] = "error"
+        logger.error(f"Cache warm-up failed: {str(e)}")
+    finally:
+        CACHE_WARMUP["finished_at"] = time.time()
+
+@app.on_event("startup")
+def start_cache_warmup():
+    """Warm the memory tier from the disk cache in the background (CACHE_WARMUP_ENTRIES=0 only restores keys)."""
+    threading.Thread(target=warm_up_memory_cache, name="cache-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_cache_janitor():
+    CACHE_JANITOR.stop()
+
+@app.on_event("startup")
+def start_cache_writer():
+    """Start the background writers persisting ingested entries and derived artifacts to the disk cache."""
+    CACHE_WRITER.start()
+    if DERIVED_ARTIFACT_CACHE.writer is not None:
+        DERIVED_ARTIFACT_CACHE.writer.start()
+
+@app.on_event("shutdown")
+def stop_cache_writer():
+    """Write every entry still queued before the server exits."""
+    CACHE_WRITER.stop()
+    if DERIVED_ARTIFACT_CACHE.writer is not None:
+        DERIVED_ARTIFACT_CACHE.writer.stop()
+
 # Enhanced cache status endpoint with CRC information
 @app.get("/api/cache-status")
 async def get_cache_status():
-    """Get cache statistics including CRC cache information."""
+    """
+    Get cache statistics for the memory and disk tiers.
+
+    Every figure comes from running counters kept up to date on write, read
+    and evict, so this never walks the cache directory.
+    """
     try:
+        disk = summarize(await run_in_threadpool(CACHE_INDEX.stats))
+        memory = {**MEMORY_STATS.snapshot(), **stored_images.budget()}
+
         cache_stats = {
             "memory_entries": len(stored_images),
-            "disk_cache_size": 0,
-            "disk_entries": 0,
-            "total_size_mb": 0,
-            "crc_mappings": len(CRC_CACHE)
+            "disk_cache_size": disk["bytes"],
+            "disk_entries": disk["entries"],
+            "total_size_mb": disk["bytes"] / (1024 * 1024),
+            "crc_mappings": len(CRC_CACHE),
+            "memory": memory,
+            "disk": disk,
+            "encoded_frames": ENCODED_FRAME_CACHE.stats(),
+            "rendered_frames": RENDERED_FRAME_CACHE.stats(),
+            "preview_frames": PREVIEW_FRAME_CACHE.stats(),
+            "frame_variants": FRAME_VARIANT_CACHE.stats(),
+            "janitor": CACHE_JANITOR.stats(),
+            "write_behind": CACHE_WRITER.stats(),
+            "derived_write_behind": DERIVED_ARTIFACT_CACHE.writer.stats() if DERIVED_ARTIFACT_CACHE.writer else None,
+            "warmup": dict(CACHE_WARMUP)
         }
 
-        if CACHE_DIR.exists():
-            for cache_dir in CACHE_DIR.iterdir():
-                if cache_dir.is_dir():
-                    cache_stats["disk_entries"] += 1
-                    for file in cache_dir.rglob("*"):
-                        if file.is_file():
-                            cache_stats["disk_cache_size"] += file.stat().st_size
-
-        cache_stats["total_size_mb"] = cache_stats["disk_cache_size"] / (1024 * 1024)
-
         return cache_stats
 
     except Exception as e:
@@ -2301,11 +3704,10 @@ async def get_cache_status():
 @app.get("/api/file_info/{dicom_file_path}")
 async def get_file_info(dicom_file_path: str):
     """Get file information"""
-    if dicom_file_path not in stored_images:
+    file_data = await load_stored_entry(dicom_file_path)
+    if file_data is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    file_data = stored_images[dicom_file_path]
-
     if file_data.get("type") == "e2e":
         eye_data = file_data.get("eye_data", {})
         return JSONResponse(content={
@@ -2316,7 +3718,7 @@ async def get_file_info(dicom_file_path: str):
             "metadata": eye_data.get("metadata", {})
         })
     else:
-        num_frames = len([k for k in file_data.keys() if isinstance(k, int)])
+        num_frames = get_frame_count(file_data)
         return JSONResponse(content={
             "type": "dicom",
             "number_of_frames": num_frames,
@@ -2353,7 +3755,7 @@ async def get_file_tree_structure():
         }
 
         # Populate with currently loaded files
-        for key, file_data in stored_images.items():
+        for key, file_data in stored_images.snapshot():
             file_info = {
                 "id": key,
                 "name": f"File_{key[:8]}",
@@ -2371,7 +3773,7 @@ async def get_file_tree_structure():
                 # Add to E2E folder
                 tree_structure["folders"][1]["children"].append(file_info)
             else:
-                file_info["frames"] = len([k for k in file_data.keys() if isinstance(k, int)])
+                file_info["frames"] = get_frame_count(file_data)
                 # Add to DICOM folder
                 tree_structure["folders"][2]["children"].append(file_info)
 
@@ -2389,8 +3791,15 @@ async def get_file_tree_structure():
         raise HTTPException(status_code=500, detail=str(e))
 
 def main():
-    # Run the Uvicorn server
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Run the Uvicorn server. Workers share frames and job status through the
+    # disk cache and its index; reload mode only supports a single worker.
+    workers = int(os.getenv("UVICORN_WORKERS", 1))
+    if workers > 1:
+        # Every worker runs its own ingest pool: split the cores between them
+        os.environ.setdefault("INGEST_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
 
 if __name__ == "__main__":
     main()
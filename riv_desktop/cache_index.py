@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from riv_desktop.disk_cache import CacheEntry
+
+logger = logging.getLogger("kodiac_v1")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    fingerprint TEXT PRIMARY KEY,
+    file_type TEXT NOT NULL,
+    location TEXT NOT NULL,
+    frame_count INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    source_size INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    access_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_by_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_by_type ON entries (file_type, last_access);
+
+CREATE TABLE IF NOT EXISTS stats (
+    file_type TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+
+-- User-facing keys (dicom_file_path) handed out for each fingerprint, so they survive a restart
+CREATE TABLE IF NOT EXISTS keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS keys_by_fingerprint ON keys (fingerprint);
+
+-- Ingest job records, so any API worker can answer a status poll
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS keys_on_delete AFTER DELETE ON entries BEGIN
+    DELETE FROM keys WHERE fingerprint = OLD.fingerprint;
+END;
+
+-- Entry and byte totals follow every change to entries, so reading them is O(1)
+-- Missing stats rows are added with WHERE NOT EXISTS: the upsert in put() would
+-- override INSERT OR IGNORE in a trigger with its own ABORT
+CREATE TRIGGER IF NOT EXISTS stats_on_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO stats (file_type) SELECT NEW.file_type WHERE NOT EXISTS (SELECT 1 FROM stats WHERE file_type = NEW.file_type);
+    UPDATE stats SET entries = entries + 1, bytes = bytes + NEW.size_bytes WHERE file_type = NEW.file_type;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_on_delete AFTER DELETE ON entries BEGIN
+    UPDATE stats SET entries = entries - 1, bytes = bytes - OLD.size_bytes WHERE file_type = OLD.file_type;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_on_update AFTER UPDATE OF file_type, size_bytes ON entries BEGIN
+    UPDATE stats SET entries = entries - 1, bytes = bytes - OLD.size_bytes WHERE file_type = OLD.file_type;
+    INSERT INTO stats (file_type) SELECT NEW.file_type WHERE NOT EXISTS (SELECT 1 FROM stats WHERE file_type = NEW.file_type);
+    UPDATE stats SET entries = entries + 1, bytes = bytes + NEW.size_bytes WHERE file_type = NEW.file_type;
+END;
+"""
+
+# Indexes created before the stats table existed start from their current contents
+_BACKFILL_STATS = """
+INSERT INTO stats (file_type, entries, bytes)
+SELECT file_type, COUNT(*), SUM(size_bytes) FROM entries GROUP BY file_type
+"""
+
+class CacheIndex:
+    """
+    SQLite index of the disk cache: fingerprint -> file type, location
+    (relative to the cache directory), frame count, sizes, created and
+    last-access times.
+
+    The database runs in WAL mode so ingest workers can write while the API
+    process reads. Every thread of every process gets its own connection.
+    """
+
+    def __init__(self, cache_dir: Path, filename: str = "index.sqlite3"):
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / filename
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Connections must not cross a fork into a worker process
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._migrate(conn)
+                conn.executescript(_SCHEMA)
+                if conn.execute("SELECT COUNT(*) FROM stats").fetchone()[0] == 0:
+                    conn.execute(_BACKFILL_STATS)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        # Indexes written before access counts were tracked
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(entries)")}
+        if columns and "access_count" not in columns:
+            conn.execute("ALTER TABLE entries ADD COLUMN access_count INTEGER NOT NULL DEFAULT 0")
+        # Stats triggers that used INSERT OR IGNORE failed every put() of an existing fingerprint
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'stats_on_%'")
+        for row in triggers.fetchall():
+            if "OR IGNORE" in row["sql"]:
+                conn.execute(f"DROP TRIGGER {row['name']}")
+
+    def put(self, fingerprint: str, file_type: str, location: Path, frame_count: int = 0,
+            size_bytes: int = 0, source_size: int = 0, created_at: Optional[float] = None):
+        """Add or replace the entry for a fingerprint."""
+        now = time.time()
+        created_at = now if created_at is None else created_at
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would bypass the stats triggers
+        self._connect().execute(
+            "INSERT INTO entries (fingerprint, file_type, location, frame_count, size_bytes, source_size, "
+            "created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (fingerprint) DO UPDATE SET file_type = excluded.file_type, location = excluded.location, "
+            "frame_count = excluded.frame_count, size_bytes = excluded.size_bytes, "
+            "source_size = excluded.source_size, created_at = excluded.created_at, last_access = excluded.last_access",
+            (fingerprint, file_type, self._relative(location), frame_count, size_bytes, source_size, created_at, now)
+        )
+
+    def lookup(self, fingerprint: str) -> Optional[dict]:
+        """The entry for a fingerprint with its absolute path, or None."""
+        row = self._connect().execute("SELECT * FROM entries WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["path"] = self.cache_dir / entry["location"]
+        return entry
+
+    def touch(self, fingerprint: str, when: Optional[float] = None):
+        """Record a read of an entry: bumps its last-access time and counts a hit."""
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "UPDATE entries SET last_access = ?, access_count = access_count + 1 WHERE fingerprint = ?",
+                (time.time() if when is None else when, fingerprint)
+            )
+            conn.execute(
+                "UPDATE stats SET hits = hits + 1 WHERE file_type = (SELECT file_type FROM entries WHERE fingerprint = ?)",
+                (fingerprint,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record_miss(self, file_type: str):
+        conn = self._connect()
+        conn.execute("INSERT OR IGNORE INTO stats (file_type) VALUES (?)", (file_type,))
+        conn.execute("UPDATE stats SET misses = misses + 1 WHERE file_type = ?", (file_type,))
+
+    def remove(self, fingerprint: str, evicted: bool = False):
+        conn = self._connect()
+        if evicted:
+            conn.execute(
+                "UPDATE stats SET evictions = evictions + 1 "
+                "WHERE file_type = (SELECT file_type FROM entries WHERE fingerprint = ?)",
+                (fingerprint,)
+            )
+        conn.execute("DELETE FROM entries WHERE fingerprint = ?", (fingerprint,))
+
+    def stats(self) -> dict:
+        """Running totals per file type: entries, bytes, hits, misses, evictions."""
+        return {
+            row["file_type"]: {k: row[k] for k in ("entries", "bytes", "hits", "misses", "evictions")}
+            for row in self._connect().execute("SELECT * FROM stats")
+        }
+
+    def rename(self, old_fingerprint: str, new_fingerprint: str, location: Path):
+        """Re-key an entry that was moved to a new location."""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE entries SET fingerprint = ?, location = ? WHERE fingerprint = ?",
+            (new_fingerprint, self._relative(location), old_fingerprint)
+        )
+        conn.execute("UPDATE keys SET fingerprint = ? WHERE fingerprint = ?", (new_fingerprint, old_fingerprint))
+
+    def map_key(self, key: str, fingerprint: str, file_type: str):
+        """Remember that a user-facing key refers to a fingerprint."""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO keys (key, fingerprint, file_type, created_at) VALUES (?, ?, ?, ?)",
+            (key, fingerprint, file_type, time.time())
+        )
+
+    def key_mappings(self) -> list:
+        """(key, fingerprint, file_type) of every key whose entry is still cached, newest first."""
+        return [
+            (row["key"], row["fingerprint"], row["file_type"])
+            for row in self._connect().execute(
+                "SELECT k.key, k.fingerprint, k.file_type FROM keys k "
+                "JOIN entries e ON e.fingerprint = k.fingerprint ORDER BY k.created_at DESC"
+            )
+        ]
+
+    def lookup_key(self, key: str) -> Optional[tuple]:
+        """(fingerprint, file_type) a user-facing key refers to, if its entry is still cached."""
+        row = self._connect().execute(
+            "SELECT k.fingerprint, k.file_type FROM keys k JOIN entries e ON e.fingerprint = k.fingerprint "
+            "WHERE k.key = ?", (key,)
+        ).fetchone()
+        return (row["fingerprint"], row["file_type"]) if row is not None else None
+
+    def pending_key(self, key: str) -> Optional[float]:
+        """When a key was mapped, if its entry has not been written yet; else None."""
+        row = self._connect().execute(
+            "SELECT k.created_at FROM keys k LEFT JOIN entries e ON e.fingerprint = k.fingerprint "
+            "WHERE k.key = ? AND e.fingerprint IS NULL", (key,)
+        ).fetchone()
+        return row["created_at"] if row is not None else None
+
+    def save_job(self, record: dict, ttl: float = 3600):
+        """Publish a job record for other workers, dropping records older than ttl."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, record, updated_at) VALUES (?, ?, ?)",
+            (record["job_id"], json.dumps(record, default=str), now)
+        )
+        conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - ttl,))
+
+    def load_job(self, job_id: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["record"]) if row is not None else None
+
+    def hottest(self, limit: int, by: str = "recent") -> list:
+        """
+        The limit most recently (by="recent") or most often (by="frequent")
+        accessed entries, hottest first.
+        """
+        order = "access_count DESC, last_access DESC" if by == "frequent" else "last_access DESC"
+        return [
+            dict(row) for row in self._connect().execute(
+                f"SELECT fingerprint, file_type, size_bytes, frame_count FROM entries ORDER BY {order} LIMIT ?",
+                (limit,)
+            )
+        ]
+
+    def entries(self, file_types=None) -> list:
+        """All entries as CacheEntry tuples, least recently accessed first."""
+        query = "SELECT fingerprint, file_type, location, size_bytes, last_access FROM entries"
+        params = ()
+        if file_types is not None:
+            file_types = list(file_types)
+            query += f" WHERE file_type IN ({', '.join('?' * len(file_types))})"
+            params = tuple(file_types)
+        query += " ORDER BY last_access"
+        return [
+            CacheEntry(row["file_type"], row["fingerprint"], self.cache_dir / row["location"],
+                       row["size_bytes"], row["last_access"])
+            for row in self._connect().execute(query, params)
+        ]
+
+    def reconcile(self, scanned: list) -> dict:
+        """
+        Bring the index in line with entries found on disk: index entries it
+        does not know yet and drop rows whose files are gone.
+        """
+        conn = self._connect()
+        known = {row["fingerprint"]: row["location"] for row in conn.execute("SELECT fingerprint, location FROM entries")}
+        on_disk = {entry.key for entry in scanned}
+        added, dropped = 0, 0
+
+        conn.execute("BEGIN")
+        try:
+            for entry in scanned:
+                if entry.key not in known:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO entries (fingerprint, file_type, location, size_bytes, "
+                        "created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                        (entry.key, entry.file_type, self._relative(entry.path), entry.size,
+                         entry.last_access, entry.last_access)
+                    )
+                    added += 1
+            for fingerprint, location in known.items():
+                # Rows written since the scan have files that exist but were not seen
+                if fingerprint not in on_disk and not (self.cache_dir / location).exists():
+                    conn.execute("DELETE FROM entries WHERE fingerprint = ?", (fingerprint,))
+                    dropped += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if added or dropped:
+            logger.info(f"Cache index reconciled: {added} entries added, {dropped} dropped")
+        return {"added": added, "dropped": dropped}
+
+    def _relative(self, location: Path) -> str:
+        location = Path(location)
+        try:
+            return location.relative_to(self.cache_dir).as_posix()
+        except ValueError:
+            return location.as_posix()
@@ -0,0 +1,82 @@
+import threading
+from typing import Hashable, Optional
+
+COUNTERS = ("entries", "bytes", "hits", "misses", "evictions")
+
+def hit_ratio(hits: int, misses: int) -> Optional[float]:
+    lookups = hits + misses
+    return hits / lookups if lookups else None
+
+def summarize(by_type: dict) -> dict:
+    """Totals and hit ratio over per-type counters, with the per-type breakdown."""
+    totals = {name: sum(counters.get(name, 0) for counters in by_type.values()) for name in COUNTERS}
+    return {
+        **totals,
+        "hit_ratio": hit_ratio(totals["hits"], totals["misses"]),
+        "by_type": {
+            file_type: {**counters, "hit_ratio": hit_ratio(counters.get("hits", 0), counters.get("misses", 0))}
+            for file_type, counters in by_type.items()
+        }
+    }
+
+class TierStats:
+    """
+    Running counters for one cache tier, per file type.
+
+    Entries and bytes are adjusted whenever an entry is installed, resized or
+    dropped, and hits/misses/evictions are counted as they happen, so a
+    snapshot never has to walk the tier.
+    """
+
+    def __init__(self):
+        self._by_type = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _counters(self, file_type: str) -> dict:
+        return self._by_type.setdefault(file_type, dict.fromkeys(COUNTERS, 0))
+
+    def set_entry(self, key: Hashable, file_type: str, nbytes: int):
+        """Account for an entry that was installed or changed size."""
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                counters = self._counters(previous[0])
+                counters["entries"] -= 1
+                counters["bytes"] -= previous[1]
+            counters = self._counters(file_type)
+            counters["entries"] += 1
+            counters["bytes"] += nbytes
+            self._entries[key] = (file_type, nbytes)
+
+    def remove_entry(self, key: Hashable, evicted: bool = False):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is None:
+                return
+            counters = self._counters(previous[0])
+            counters["entries"] -= 1
+            counters["bytes"] -= previous[1]
+            if evicted:
+                counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            for file_type, nbytes in self._entries.values():
+                counters = self._counters(file_type)
+                counters["entries"] -= 1
+                counters["bytes"] -= nbytes
+            self._entries.clear()
+
+    def hit(self, file_type: str):
+        with self._lock:
+            self._counters(file_type)["hits"] += 1
+
+    def miss(self, file_type: str = "unknown"):
+        with self._lock:
+            self._counters(file_type)["misses"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            by_type = {file_type: dict(counters) for file_type, counters in self._by_type.items()}
+        return summarize(by_type)
@@ -0,0 +1,235 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+logger = logging.getLogger("kodiac_v1")
+
+class WriteBehindQueue:
+    """
+    Background writer persisting cache entries after they are already being served.
+
+    submit() hands an entry to a writer thread that calls write(*args) for it;
+    writes are taken off the queue in batches of up to batch_size and
+    on_batch() runs once after each batch. At most max_pending entries wait at
+    a time: when the queue is full, submit() blocks for up to block_seconds
+    and then writes the entry itself, so a slow disk slows ingest down instead
+    of growing memory. Callers that must never block, such as job completion
+    callbacks, use submit_later(), which makes that wait on a hand-off thread
+    instead. A key submitted again while it is still waiting is written once,
+    with the latest arguments; one submitted while it is being written is
+    skipped, since keys name content. stop() writes everything still queued
+    before the thread exits.
+    """
+
+    def __init__(self, write: Callable, max_pending: int = 32, batch_size: int = 8, block_seconds: float = 5,
+                 on_batch: Optional[Callable] = None):
+        self.write = write
+        self.max_pending = max_pending
+        self.batch_size = max(1, batch_size)
+        self.block_seconds = block_seconds
+        self.on_batch = on_batch
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.inline_writes = 0
+        self.batches = 0
+        self.max_depth = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._writing = set()
+        self._thread = None
+        self._handoff = None
+        self._stopping = False
+        self._idle = threading.Condition()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="cache-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"Cache writer started (max {self.max_pending} pending, batches of {self.batch_size})")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Write everything still queued, then stop the writer thread."""
+        if self._thread is None:
+            return
+        if self._handoff is not None:
+            # Pass on everything handed to submit_later() first
+            self._handoff.shutdown(wait=True)
+            self._handoff = None
+        self._stopping = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Cache writer still had {len(self._pending)} entries queued at shutdown")
+            self._thread = None
+            return
+        self._thread = None
+        # Submitted after the writer drained its queue
+        with self._idle:
+            leftover = list(self._pending.items())
+            self._pending.clear()
+        for key, args in leftover:
+            self._write(key, args)
+        logger.info(f"Cache writer stopped after writing {self.written} entries")
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopping
+
+    def is_pending(self, key: Hashable) -> bool:
+        """Whether an entry is queued or being written."""
+        with self._idle:
+            return key in self._pending or key in self._writing
+
+    def submit(self, key: Hashable, *args) -> bool:
+        """
+        Queue write(*args) for key. Returns True if the write was queued, False
+        if it was made synchronously (writer not running, or queue still full
+        after block_seconds).
+        """
+        with self._idle:
+            if key in self._writing:
+                # The same content is being written right now
+                self.coalesced += 1
+                return True
+            if self.running and key in self._pending:
+                self._pending[key] = args
+                self.coalesced += 1
+                return True
+            if self.running:
+                self._pending[key] = args
+
+        if self.running:
+            try:
+                self._queue.put(key, timeout=self.block_seconds)
+                self.queued += 1
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+                return True
+            except queue.Full:
+                logger.warning(f"Cache write queue full for {self.block_seconds}s, writing {key} synchronously")
+                with self._idle:
+                    self._pending.pop(key, None)
+                    if key in self._writing:
+                        self.coalesced += 1
+                        self._idle.notify_all()
+                        return True
+                    self._writing.add(key)
+                self.inline_writes += 1
+                try:
+                    self._write(key, args)
+                finally:
+                    with self._idle:
+                        self._writing.discard(key)
+                        self._idle.notify_all()
+                return False
+
+        self.inline_writes += 1
+        self._write(key, args)
+        return False
+
+    def submit_later(self, key: Hashable, *args):
+        """submit() from a hand-off thread: returns at once, even while the queue is full."""
+        if not self.running:
+            self.submit(key, *args)
+            return
+        with self._idle:
+            if self._handoff is None:
+                self._handoff = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-submit")
+            handoff = self._handoff
+        handoff.submit(self._submit_logged, key, *args)
+
+    def _submit_logged(self, key: Hashable, *args):
+        try:
+            self.submit(key, *args)
+        except Exception as e:
+            logger.error(f"Queueing cache write for {key} failed: {str(e)}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued entry is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        handoff = self._handoff
+        if handoff is not None:
+            # Entries still waiting to be handed over by submit_later()
+            try:
+                handoff.submit(lambda: None).result(timeout)
+            except Exception:
+                return False
+        with self._idle:
+            while self._pending or self._writing:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def _write(self, key: Hashable, args: tuple):
+        try:
+            if self.write(*args) is False:
+                self.failed += 1
+            else:
+                self.written += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Cache write for {key} failed: {str(e)}")
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                # Sentinel from stop(): finish whatever is still queued behind it
+                stop = True
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                batch = [key for key in batch if key is not None]
+
+            written = 0
+            for key in batch:
+                with self._idle:
+                    args = self._pending.pop(key, None)
+                    if args is None:
+                        continue
+                    self._writing.add(key)
+                try:
+                    self._write(key, args)
+                    written += 1
+                finally:
+                    with self._idle:
+                        self._writing.discard(key)
+                        self._idle.notify_all()
+
+            if written:
+                self.batches += 1
+                if self.on_batch is not None:
+                    try:
+                        self.on_batch()
+                    except Exception as e:
+                        logger.warning(f"Cache writer batch callback failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "max_pending": self.max_pending,
+            "batch_size": self.batch_size,
+            "depth": self._queue.qsize(),
+            "max_depth": self.max_depth,
+            "queued": self.queued,
+            "written": self.written,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "inline_writes": self.inline_writes,
+            "batches": self.batches
+        }
@@ -0,0 +1,123 @@
+import io
+import logging
+import threading
+import time
+import warnings
+from typing import Callable, Optional
+
+import numpy as np
+import pydicom
+
+logger = logging.getLogger("kodiac_v1")
+
+# pydicom 3 replaced pixel data handlers with decoding plugins (same names for
+# pylibjpeg and gdcm) and deprecated convert_pixel_data(handler_name=...)
+PYDICOM_DECODING_PLUGINS = int(pydicom.__version__.split(".")[0]) >= 3
+
+def decode_default(dataset, dicom_bytes: Optional[bytes]) -> np.ndarray:
+    """Let pydicom pick any available pixel data handler."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return dataset.pixel_array
+
+def _decode_with_handler(handler_name: str) -> Callable:
+    def decode(dataset, dicom_bytes: Optional[bytes]) -> np.ndarray:
+        # Work on a fresh in-memory parse so a failed attempt cannot leave partial state behind
+        ds = pydicom.dcmread(io.BytesIO(dicom_bytes), force=True) if dicom_bytes is not None else dataset
+        if PYDICOM_DECODING_PLUGINS:
+            ds.pixel_array_options(decoding_plugin=handler_name)
+        else:
+            ds.convert_pixel_data(handler_name=handler_name)
+        return ds.pixel_array
+    return decode
+
+decode_pylibjpeg = _decode_with_handler("pylibjpeg")
+decode_gdcm = _decode_with_handler("gdcm")
+
+def decode_decompress(dataset, dicom_bytes: Optional[bytes]) -> np.ndarray:
+    """Decompress a copy of the dataset in place and read the result."""
+    ds = pydicom.dcmread(io.BytesIO(dicom_bytes), force=True) if dicom_bytes is not None else dataset
+    ds.decompress()
+    return ds.pixel_array
+
+class DecoderRegistry:
+    """
+    Pixel data decoders tried in order, keyed by transfer syntax.
+
+    The backend that last succeeded for a TransferSyntaxUID is tried first
+    for the next dataset with that syntax. Attempts, successes, failures and
+    latency are counted per syntax and backend. Backends get the parsed
+    dataset plus the file's bytes, so retries never go back to disk.
+    """
+
+    def __init__(self, on_result: Optional[Callable] = None):
+        self.backends = {}
+        self.preferred = {}
+        self.counters = {}
+        self.on_result = on_result
+        self._lock = threading.Lock()
+
+    def register(self, name: str, decode: Callable):
+        self.backends[name] = decode
+
+    def order_for(self, transfer_syntax: str) -> list:
+        names = list(self.backends)
+        preferred = self.preferred.get(transfer_syntax)
+        if preferred in self.backends:
+            names.remove(preferred)
+            names.insert(0, preferred)
+        return names
+
+    def record(self, transfer_syntax: str, backend: str, success: bool, elapsed_ms: float):
+        """Count one decode attempt and remember the backend if it succeeded."""
+        with self._lock:
+            counters = self.counters.setdefault(transfer_syntax, {}).setdefault(backend, {
+                "attempts": 0, "successes": 0, "failures": 0, "total_ms": 0.0
+            })
+            counters["attempts"] += 1
+            counters["successes" if success else "failures"] += 1
+            counters["total_ms"] += elapsed_ms
+            if success:
+                self.preferred[transfer_syntax] = backend
+
+    def decode(self, dataset, dicom_bytes: Optional[bytes] = None) -> Optional[np.ndarray]:
+        """Decode the dataset's pixel data, or return None if every backend fails."""
+        try:
+            transfer_syntax = str(dataset.file_meta.TransferSyntaxUID)
+        except AttributeError:
+            transfer_syntax = "unknown"
+
+        for name in self.order_for(transfer_syntax):
+            logger.info(f"Attempting decompression with {name} (transfer syntax {transfer_syntax})...")
+            start = time.perf_counter()
+            try:
+                pixel_array = self.backends[name](dataset, dicom_bytes)
+                success = True
+            except Exception as e:
+                logger.warning(f"{name} decompression failed: {str(e)}")
+                pixel_array = None
+                success = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self.record(transfer_syntax, name, success, elapsed_ms)
+            if self.on_result is not None:
+                self.on_result(transfer_syntax, name, success, elapsed_ms)
+
+            if success:
+                logger.info(f"Successfully decompressed with {name} in {elapsed_ms:.1f} ms")
+                return pixel_array
+
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for transfer_syntax, backends in self.counters.items():
+                stats[transfer_syntax] = {
+                    "preferred": self.preferred.get(transfer_syntax),
+                    "backends": {
+                        name: {**c, "avg_ms": c["total_ms"] / c["attempts"] if c["attempts"] else 0.0}
+                        for name, c in backends.items()
+                    }
+                }
+            return stats
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from riv_desktop.cache_writer import WriteBehindQueue
+from riv_desktop.disk_cache import FrameContainer, container_path, remove_entry, touch_entry, write_container
+from riv_desktop.fingerprint import FINGERPRINT_DIGEST_SIZE
+
+logger = logging.getLogger("kodiac_v1")
+
+DERIVED_FILE_TYPE = "derived"
+
+# Bump an artifact's version whenever the algorithm producing it changes; the
+# version is part of the key, so entries made by the old algorithm are never
+# served again and age out of the disk cache like any unused entry
+ALGORITHM_VERSIONS = {
+    "flatten": 1,
+    "e2e_flatten": 1,
+    "window": 1,
+}
+
+def artifact_key(source: str, artifact: str, params: Optional[dict] = None, version: Optional[int] = None) -> str:
+    """
+    Cache key of a derived artifact: a fingerprint of the source fingerprint,
+    artifact type, canonical JSON of its parameters and algorithm version.
+    """
+    if version is None:
+        version = ALGORITHM_VERSIONS.get(artifact, 1)
+    canonical = json.dumps(
+        {"source": source, "artifact": artifact, "params": params or {}, "version": version},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=FINGERPRINT_DIGEST_SIZE).hexdigest()
+
+class DerivedArtifactCache:
+    """
+    Disk cache of artifacts computed from a cached source - flattened images,
+    re-windowed renders and the like - so they survive restarts and are shared
+    by every worker.
+
+    Each artifact is a one-frame container under cache/derived/, recorded in
+    the cache index with file type "derived" so the janitor budgets, ages and
+    evicts it alongside the source entries. With write_behind, put() only
+    queues the write for a background writer (started and stopped with
+    writer.start()/stop()), so requests never wait for the disk.
+    """
+
+    def __init__(self, cache_dir: Path, index, enabled: bool = True, write_behind: bool = False,
+                 on_batch: Optional[Callable] = None):
+        self.cache_dir = Path(cache_dir)
+        self.index = index
+        self.enabled = enabled
+        self.writer = WriteBehindQueue(self.write, on_batch=on_batch) if write_behind else None
+
+    def get(self, source: str, artifact: str, params: Optional[dict] = None) -> Optional[bytes]:
+        """The cached payload of an artifact, or None."""
+        if not self.enabled or not source:
+            return None
+        key = artifact_key(source, artifact, params)
+        try:
+            entry = self.index.lookup(key)
+            if entry is None:
+                self.index.record_miss(DERIVED_FILE_TYPE)
+                return None
+            try:
+                with FrameContainer(entry["path"]) as container:
+                    payload = bytes(container.frame(0))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Dropping unreadable {artifact} artifact {key}: {str(e)}")
+                remove_entry(entry["path"])
+                self.index.remove(key)
+                self.index.record_miss(DERIVED_FILE_TYPE)
+                return None
+            self.index.touch(key)
+            touch_entry(entry["path"])
+            return payload
+        except Exception as e:
+            logger.warning(f"Error reading {artifact} artifact for {source}: {str(e)}")
+            return None
+
+    def put(self, source: str, artifact: str, params: Optional[dict], payload: bytes, media_type: str) -> bool:
+        """Persist an artifact, in the background if the writer is running. Returns False if it is not cached."""
+        if not self.enabled or not source:
+            return False
+        if self.writer is not None and self.writer.running:
+            key = artifact_key(source, artifact, params)
+            self.writer.submit_later(key, source, artifact, params, payload, media_type)
+            return True
+        return self.write(source, artifact, params, payload, media_type)
+
+    def write(self, source: str, artifact: str, params: Optional[dict], payload: bytes, media_type: str) -> bool:
+        """Write an artifact now. Failures are logged, never raised - the artifact can always be recomputed."""
+        key = artifact_key(source, artifact, params)
+        path = container_path(self.cache_dir, DERIVED_FILE_TYPE, key)
+        metadata = {
+            "source": source,
+            "artifact": artifact,
+            "params": params or {},
+            "version": ALGORITHM_VERSIONS.get(artifact, 1),
+            "media_type": media_type,
+            "file_type": DERIVED_FILE_TYPE,
+            "cached_at": time.time()
+        }
+        try:
+            size = write_container(path, {0: payload}, metadata)
+            self.index.put(key, DERIVED_FILE_TYPE, path, frame_count=1, size_bytes=size)
+            return True
+        except Exception as e:
+            logger.warning(f"Error caching {artifact} artifact for {source}: {str(e)}")
+            return False
@@ -0,0 +1,406 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process runs its own janitor
+    fcntl = None
+
+logger = logging.getLogger("kodiac_v1")
+
+# Packed cache container, one file per cache entry:
+#   header   magic, format version, frame count, metadata length
+#   metadata UTF-8 JSON
+#   index    (frame number, offset, length) per frame, offsets from the start of the file
+#   payload  encoded frames, concatenated
+# The file the frames were made from can be stored along with them, as the
+# payload indexed under SOURCE_FRAME; it is not one of the container's frames.
+CONTAINER_MAGIC = b"RIVC"
+CONTAINER_VERSION = 1
+CONTAINER_SUFFIX = ".rivc"
+SOURCE_FRAME = 0xFFFFFFFF
+# Held by the one process running the janitor of a cache directory
+JANITOR_LOCK_NAME = ".janitor.lock"
+_HEADER = struct.Struct("<4sHHII")
+_INDEX_ENTRY = struct.Struct("<IQQ")
+
+def container_path(cache_dir: Path, file_type: str, crc: str) -> Path:
+    """
+    Location of the container for a cache entry.
+
+    Entries are fanned out over subdirectories named after the first two
+    characters of the key, so no directory grows past a few thousand files.
+    """
+    return Path(cache_dir) / file_type / crc[:2] / f"{crc}{CONTAINER_SUFFIX}"
+
+def write_container(path: Path, frames: dict, metadata: dict, source: Optional[bytes] = None) -> int:
+    """
+    Write frames ({frame number: bytes}), metadata and optionally the source
+    file into a container.
+
+    The file is written next to its final location and moved into place with
+    os.replace, so readers never see a partially written container.
+
+    Returns:
+        Size of the container in bytes
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if source is not None:
+        frames = {**frames, SOURCE_FRAME: source}
+    frame_numbers = sorted(frames)
+    meta_bytes = json.dumps(metadata, default=str).encode("utf-8")
+    offset = _HEADER.size + len(meta_bytes) + _INDEX_ENTRY.size * len(frame_numbers)
+
+    index = bytearray()
+    for frame in frame_numbers:
+        length = len(frames[frame])
+        index += _INDEX_ENTRY.pack(frame, offset, length)
+        offset += length
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, len(frame_numbers), len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(index)
+            for frame in frame_numbers:
+                f.write(frames[frame])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return offset
+
+class FrameContainer:
+    """
+    Read-only view of a cache container through mmap.
+
+    Opening parses the header and index; each frame is then a slice of the
+    mapping, so reading one frame costs no further syscalls. The stored
+    source file, if any, is read with source().
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _parse(self):
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"Cache container {self.path} is truncated")
+        magic, version, _, frame_count, meta_length = _HEADER.unpack_from(self._map, 0)
+        if magic != CONTAINER_MAGIC or version != CONTAINER_VERSION:
+            raise ValueError(f"Unsupported cache container {self.path}")
+
+        meta_start = _HEADER.size
+        self.metadata = json.loads(bytes(self._map[meta_start:meta_start + meta_length]).decode("utf-8"))
+
+        self.index = {}
+        self._source = None
+        position = meta_start + meta_length
+        for _ in range(frame_count):
+            frame, offset, length = _INDEX_ENTRY.unpack_from(self._map, position)
+            if offset + length > len(self._map):
+                raise ValueError(f"Cache container {self.path} is truncated")
+            if frame == SOURCE_FRAME:
+                self._source = (offset, length)
+            else:
+                self.index[frame] = (offset, length)
+            position += _INDEX_ENTRY.size
+
+    @property
+    def frame_numbers(self) -> list:
+        return sorted(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, frame: int):
+        return frame in self.index
+
+    def frame(self, frame: int) -> Optional[bytes]:
+        """Payload of one frame, or None if the container does not hold it."""
+        location = self.index.get(frame)
+        if location is None:
+            return None
+        offset, length = location
+        return self._map[offset:offset + length]
+
+    @property
+    def has_source(self) -> bool:
+        return self._source is not None
+
+    def source(self) -> Optional[bytes]:
+        """The source file stored with the frames, or None."""
+        if self._source is None:
+            return None
+        offset, length = self._source
+        return self._map[offset:offset + length]
+
+    @property
+    def size(self) -> int:
+        return len(self._map)
+
+    def nbytes(self) -> int:
+        """Memory the mapping takes once its pages are resident, for the memory tier's budget."""
+        return len(self._map)
+
+    def preload(self):
+        """
+        Bring the whole container into the page cache ahead of the first
+        request: madvise(WILLNEED) where available, else one read per page.
+        """
+        if hasattr(mmap, "MADV_WILLNEED"):
+            self._map.madvise(mmap.MADV_WILLNEED)
+        else:
+            for offset in range(0, len(self._map), mmap.PAGESIZE):
+                self._map[offset]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+CacheEntry = namedtuple("CacheEntry", ["file_type", "key", "path", "size", "last_access"])
+
+def touch_entry(path: Path):
+    """Record an access to a cache entry; its mtime is the last-access time used for LRU eviction."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def remove_entry(path: Path) -> int:
+    """Delete a container (or a legacy cache directory). Returns the bytes freed."""
+    path = Path(path)
+    try:
+        if path.is_dir():
+            size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            shutil.rmtree(path)
+        else:
+            size = path.stat().st_size
+            path.unlink()
+        return size
+    except FileNotFoundError:
+        return 0
+
+def scan_entries(cache_dir: Path, file_types) -> list:
+    """List every cache entry of the given types, containers and legacy directories alike."""
+    entries = []
+    for file_type in file_types:
+        type_dir = Path(cache_dir) / file_type
+        if not type_dir.is_dir():
+            continue
+        for child in type_dir.iterdir():
+            try:
+                if not child.is_dir():
+                    continue
+                if (child / "metadata.pkl").exists():
+                    # Directory written by the old per-frame format
+                    size = sum(f.stat().st_size for f in child.rglob("*") if f.is_file())
+                    entries.append(CacheEntry(file_type, child.name, child, size, child.stat().st_mtime))
+                    continue
+                for path in child.glob(f"*{CONTAINER_SUFFIX}"):
+                    stat = path.stat()
+                    entries.append(CacheEntry(file_type, path.stem, path, stat.st_size, stat.st_mtime))
+            except FileNotFoundError:
+                # Removed while scanning
+                continue
+    return entries
+
+def remove_stale_temp_files(cache_dir: Path, max_age_seconds: float = 3600) -> int:
+    """Delete temporary files left behind by writes that never completed."""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for path in Path(cache_dir).rglob(".*.tmp"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+class DiskCacheJanitor:
+    """
+    Background thread keeping the disk cache within its byte budgets.
+
+    Each pass drops expired entries, then evicts the least recently accessed
+    entries of any type over its quota, then of the whole cache until it is
+    under max_bytes. A budget of 0 means unlimited. Passes run every interval
+    seconds, or sooner when wake() is called after a write; only the timed
+    passes also sweep the cache directory for stale temporary files.
+
+    With an index (see cache_index.CacheIndex) entries are listed from it
+    instead of walking the cache directory; the first pass reconciles the
+    index with what is on disk.
+
+    Processes sharing a cache directory (API workers) run a single janitor:
+    start() only starts the thread in the process that takes the lock file,
+    and wake() is a no-op in the others.
+    """
+
+    def __init__(self, cache_dir: Path, file_types, max_bytes: int = 0, quotas: Optional[dict] = None,
+                 max_age_seconds: float = 0, interval: float = 300, index=None):
+        self.index = index
+        self._reconciled = False
+        self.cache_dir = Path(cache_dir)
+        self.file_types = list(file_types)
+        self.max_bytes = max_bytes
+        self.quotas = {t: q for t, q in (quotas or {}).items() if q}
+        self.max_age_seconds = max_age_seconds
+        self.interval = interval
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.last_run = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._owner_lock = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not self._acquire_owner_lock():
+            logger.info(f"Cache janitor of {self.cache_dir} runs in another process")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-janitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Cache janitor started (max {self.max_bytes} bytes, quotas {self.quotas}, every {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._owner_lock is not None:
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def _acquire_owner_lock(self) -> bool:
+        """Take the cache directory's janitor lock without blocking; True if this process holds it."""
+        if fcntl is None:
+            return True
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.cache_dir / JANITOR_LOCK_NAME, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._owner_lock = lock_file
+        return True
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        sweep = True
+        while not self._stop.is_set():
+            try:
+                self.run_once(sweep_temp_files=sweep)
+            except Exception as e:
+                logger.error(f"Cache janitor pass failed: {str(e)}")
+            # A wake() after a write checks the budgets only; walking the
+            # whole cache for temporary files waits for the timer
+            sweep = not self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _entries(self) -> list:
+        if self.index is None:
+            return scan_entries(self.cache_dir, self.file_types)
+        if not self._reconciled:
+            self.index.reconcile(scan_entries(self.cache_dir, self.file_types))
+            self._reconciled = True
+        return self.index.entries(self.file_types)
+
+    def _evict(self, entry: CacheEntry, reason: str) -> int:
+        freed = remove_entry(entry.path)
+        if self.index is not None:
+            self.index.remove(entry.key, evicted=True)
+        self.evictions += 1
+        self.evicted_bytes += freed
+        logger.info(f"Evicted {entry.file_type} cache entry {entry.key} ({freed} bytes, {reason})")
+        return freed
+
+    def run_once(self, sweep_temp_files: bool = True) -> dict:
+        """Run one eviction pass. Returns the number of entries and bytes evicted."""
+        with self._lock:
+            evicted, freed = 0, 0
+            if sweep_temp_files:
+                remove_stale_temp_files(self.cache_dir)
+            entries = sorted(self._entries(), key=lambda e: e.last_access)
+
+            if self.max_age_seconds:
+                cutoff = time.time() - self.max_age_seconds
+                expired = [e for e in entries if e.last_access < cutoff]
+                for entry in expired:
+                    freed += self._evict(entry, "expired")
+                evicted += len(expired)
+                entries = [e for e in entries if e.last_access >= cutoff]
+
+            evict = set()
+            for file_type, quota in self.quotas.items():
+                typed = [e for e in entries if e.file_type == file_type]
+                used = sum(e.size for e in typed)
+                for entry in typed:
+                    if used <= quota:
+                        break
+                    evict.add(entry.path)
+                    used -= entry.size
+
+            if self.max_bytes:
+                used = sum(e.size for e in entries if e.path not in evict)
+                for entry in entries:
+                    if used <= self.max_bytes:
+                        break
+                    if entry.path not in evict:
+                        evict.add(entry.path)
+                        used -= entry.size
+
+            for entry in entries:
+                if entry.path in evict:
+                    freed += self._evict(entry, "over budget")
+                    evicted += 1
+
+            self.last_run = time.time()
+            return {"evicted": evicted, "freed_bytes": freed}
+
+    def stats(self) -> dict:
+        return {
+            "max_bytes": self.max_bytes,
+            "quotas": self.quotas,
+            "max_age_seconds": self.max_age_seconds,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "last_run": self.last_run
+        }
@@ -0,0 +1,168 @@
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+try:
+    from pydicom.encaps import generate_frames as _generate_frames
+
+    def _iter_frames(pixel_data: bytes, number_of_frames: int):
+        return _generate_frames(pixel_data, number_of_frames=number_of_frames)
+except ImportError:
+    from pydicom.encaps import generate_pixel_data_frame as _generate_frames
+
+    def _iter_frames(pixel_data: bytes, number_of_frames: int):
+        return _generate_frames(pixel_data, number_of_frames)
+
+try:
+    from pylibjpeg import decode as _pylibjpeg_decode
+except ImportError:
+    _pylibjpeg_decode = None
+
+logger = logging.getLogger("kodiac_v1")
+
+DECODED_FRAME_CACHE_SIZE = int(os.getenv("DECODED_FRAME_CACHE_SIZE", 16))
+
+# Transfer syntaxes whose frames are standalone JPEG / JPEG 2000 codestreams
+JPEG_BASELINE = '1.2.840.10008.1.2.4.50'
+PILLOW_SYNTAXES = {
+    JPEG_BASELINE,
+    '1.2.840.10008.1.2.4.90',
+    '1.2.840.10008.1.2.4.91',
+}
+PYLIBJPEG_SYNTAXES = PILLOW_SYNTAXES | {
+    '1.2.840.10008.1.2.4.51',
+    '1.2.840.10008.1.2.4.57',
+    '1.2.840.10008.1.2.4.70',
+}
+
+# Everything but the codestreams needed to decode a source's frames
+HEADER_FIELDS = ("transfer_syntax", "rows", "columns", "bits_allocated", "bits_stored",
+                 "pixel_representation", "photometric_interpretation")
+
+class EncapsulatedFrameSource:
+    """
+    Frame-granular access to an encapsulated (compressed) multi-frame dataset.
+
+    Only the header and the fragment/offset table are processed up front: the
+    compressed codestream of every frame is kept, and a frame is decoded the
+    first time it is needed. Recently decoded frames are kept in a small LRU.
+    """
+
+    def __init__(self, dataset, number_of_frames: int, cache_size: int = DECODED_FRAME_CACHE_SIZE):
+        self.transfer_syntax = str(dataset.file_meta.TransferSyntaxUID)
+        self.number_of_frames = number_of_frames
+        self.rows = int(dataset.Rows)
+        self.columns = int(dataset.Columns)
+        self.bits_allocated = int(dataset.get("BitsAllocated", 8))
+        self.bits_stored = int(dataset.get("BitsStored", self.bits_allocated))
+        self.pixel_representation = int(dataset.get("PixelRepresentation", 0))
+        self.photometric_interpretation = str(dataset.get("PhotometricInterpretation", ""))
+        self.frames = list(_iter_frames(dataset.PixelData, number_of_frames))
+        if len(self.frames) != number_of_frames:
+            raise ValueError(f"Expected {number_of_frames} encapsulated frames, found {len(self.frames)}")
+        self.cache_size = cache_size
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frames(cls, header: dict, frames: list, cache_size: int = DECODED_FRAME_CACHE_SIZE):
+        """Rebuild a source from the header() of another and its codestreams, e.g. read from the disk cache."""
+        source = cls.__new__(cls)
+        for name in HEADER_FIELDS:
+            setattr(source, name, header[name])
+        source.number_of_frames = len(frames)
+        source.frames = list(frames)
+        source.cache_size = cache_size
+        source._decoded = OrderedDict()
+        source._lock = threading.Lock()
+        return source
+
+    def header(self) -> dict:
+        """The decoding parameters of the frames, as plain values for from_frames."""
+        return {name: getattr(self, name) for name in HEADER_FIELDS}
+
+    @staticmethod
+    def supports(dataset) -> bool:
+        """Whether the dataset's frames can be decoded one at a time."""
+        try:
+            transfer_syntax = str(dataset.file_meta.TransferSyntaxUID)
+        except AttributeError:
+            return False
+        if int(dataset.get("SamplesPerPixel", 1)) != 1:
+            return False
+        syntaxes = PYLIBJPEG_SYNTAXES if _pylibjpeg_decode is not None else PILLOW_SYNTAXES
+        return transfer_syntax in syntaxes
+
+    def __getstate__(self):
+        # The decoded-frame cache and its lock stay with the process that built them
+        state = self.__dict__.copy()
+        state["_decoded"] = OrderedDict()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def display_ready(self) -> bool:
+        """
+        Whether the stored frames are 8-bit greyscale baseline JPEGs a browser
+        can show as they are, so they can be served without re-encoding.
+        """
+        return (
+            self.transfer_syntax == JPEG_BASELINE
+            and self.bits_allocated == 8
+            and self.bits_stored == 8
+            and self.pixel_representation == 0
+            and self.photometric_interpretation == "MONOCHROME2"
+        )
+
+    def raw_frame(self, frame: int) -> bytes:
+        """The compressed codestream of a frame."""
+        return self.frames[frame]
+
+    def _decode_codestream(self, data: bytes) -> np.ndarray:
+        if _pylibjpeg_decode is not None:
+            return np.asarray(_pylibjpeg_decode(data))
+        with Image.open(io.BytesIO(data)) as img:
+            return np.array(img)
+
+    def decode(self, frame: int) -> np.ndarray:
+        """Decode a single frame, going through the decoded-frame LRU."""
+        with self._lock:
+            pixels = self._decoded.get(frame)
+            if pixels is not None:
+                self._decoded.move_to_end(frame)
+                return pixels
+
+        pixels = self._decode_codestream(self.frames[frame])
+        if pixels.shape[:2] != (self.rows, self.columns):
+            raise ValueError(f"Decoded frame {frame} has shape {pixels.shape}, expected {(self.rows, self.columns)}")
+
+        with self._lock:
+            self._decoded[frame] = pixels
+            while len(self._decoded) > self.cache_size:
+                self._decoded.popitem(last=False)
+        return pixels
+
+    def value_range(self) -> tuple[float, float]:
+        """
+        (min, max) pixel value over every frame. Frames are decoded one at a
+        time and not kept, so this costs one frame of memory at most.
+        """
+        min_value, max_value = float("inf"), float("-inf")
+        for data in self.frames:
+            pixels = self._decode_codestream(data)
+            min_value = min(min_value, float(pixels.min()))
+            max_value = max(max_value, float(pixels.max()))
+        return min_value, max_value
+
+    def nbytes(self) -> int:
+        return sum(len(f) for f in self.frames) + sum(p.nbytes for p in self._decoded.values())
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import os
+import zlib
+
+logger = logging.getLogger("kodiac_v1")
+
+# BLAKE2b with a 128-bit digest: collisions are out of reach at any realistic
+# archive size, and hashing runs at memory speed
+FINGERPRINT_DIGEST_SIZE = 16
+FINGERPRINT_CHUNK_SIZE = int(os.getenv("FINGERPRINT_CHUNK_SIZE", 1024 * 1024))
+
+class StreamingFingerprint:
+    """
+    Content fingerprint fed one chunk at a time.
+
+    The CRC32 the cache used to be keyed by is computed alongside, so entries
+    written before fingerprints were introduced can still be found.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=FINGERPRINT_DIGEST_SIZE)
+        self._crc = 0
+        self.size = 0
+
+    def update(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._crc = zlib.crc32(chunk, self._crc)
+        self.size += len(chunk)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def legacy_crc(self) -> str:
+        return format(self._crc & 0xFFFFFFFF, '08x')
+
+def fingerprint_bytes(content: bytes) -> StreamingFingerprint:
+    """Fingerprint content that is already in memory."""
+    fingerprint = StreamingFingerprint()
+    view = memoryview(content)
+    for start in range(0, len(view), FINGERPRINT_CHUNK_SIZE):
+        fingerprint.update(view[start:start + FINGERPRINT_CHUNK_SIZE])
+    return fingerprint
+
+def fingerprint_file(file_path: str, chunk_size: int = FINGERPRINT_CHUNK_SIZE) -> StreamingFingerprint:
+    """Fingerprint a file in fixed-size chunks without loading it whole."""
+    fingerprint = StreamingFingerprint()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            fingerprint.update(chunk)
+    return fingerprint
+
+def copy_with_fingerprint(source, destination, chunk_size: int = FINGERPRINT_CHUNK_SIZE) -> StreamingFingerprint:
+    """
+    Copy a readable stream into a writable one, fingerprinting each chunk as
+    it is written so the file never has to be read back.
+    """
+    fingerprint = StreamingFingerprint()
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        destination.write(chunk)
+        fingerprint.update(chunk)
+    return fingerprint
+
+def fingerprint_text(text: str) -> StreamingFingerprint:
+    """Fingerprint a string, e.g. object metadata standing in for content that has not been downloaded."""
+    return fingerprint_bytes(text.encode('utf-8'))
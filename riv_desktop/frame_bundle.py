@@ -0,0 +1,80 @@
+import json
+import struct
+import uuid
+
+# Length-prefixed frame bundle, one response carrying many frames:
+#   header   magic, format version, index length
+#   index    UTF-8 JSON: {"frames": [{"frame", "offset", "length", "etag"}, ...], ...}
+#   payload  encoded frames, concatenated; offsets are from the start of the payload
+BUNDLE_MAGIC = b"RIVB"
+BUNDLE_VERSION = 1
+BUNDLE_MEDIA_TYPE = "application/x-riv-frame-bundle"
+_HEADER = struct.Struct("<4sHI")
+
+def parse_frame_list(frames: str = None, start: int = None, end: int = None, limit: int = None) -> list:
+    """
+    Frame numbers asked for by a batch request: a comma-separated list with
+    optional ranges ("0,4,10-15"), or start..end inclusive.
+
+    Raises:
+        ValueError: The list is malformed, a range runs backwards, or more
+            than limit frames are asked for. The limit is checked before any
+            range is expanded, so a huge range costs nothing.
+    """
+    def check(count: int):
+        if limit is not None and count > limit:
+            raise ValueError(f"At most {limit} frames per request")
+
+    if frames:
+        numbers = []
+        for part in frames.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                first, last = part.split("-", 1)
+                first, last = int(first), int(last)
+                if last < first:
+                    raise ValueError(f"Range {part} ends before it starts")
+                check(len(numbers) + last - first + 1)
+                numbers.extend(range(first, last + 1))
+            else:
+                check(len(numbers) + 1)
+                numbers.append(int(part))
+        # Keep the client's order (e.g. nearest frames first), without duplicates
+        return list(dict.fromkeys(numbers))
+    if start is None:
+        return []
+    end = start if end is None else end
+    if end < start:
+        raise ValueError("end is before start")
+    check(end - start + 1)
+    return list(range(start, end + 1))
+
+def pack_bundle(frames: list, media_type: str, **info) -> bytes:
+    """Pack [(frame number, payload, etag), ...] into a bundle; info is added to the JSON index."""
+    entries = []
+    offset = 0
+    for frame, payload, etag in frames:
+        entries.append({"frame": frame, "offset": offset, "length": len(payload), "etag": etag})
+        offset += len(payload)
+    index = json.dumps({**info, "media_type": media_type, "frames": entries}).encode("utf-8")
+    return b"".join([_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index)), index] + [f[1] for f in frames])
+
+def pack_multipart(frames: list, media_type: str) -> tuple:
+    """Pack [(frame number, payload, etag), ...] as multipart/mixed. Returns (body, content type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for frame, payload, etag in frames:
+        headers = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Content-ID: <frame-{frame}>\r\n"
+            f"X-Frame-Number: {frame}\r\n"
+            + (f"ETag: {etag}\r\n" if etag else "")
+            + "\r\n"
+        )
+        parts += [headers.encode("ascii"), payload, b"\r\n"]
+    parts.append(f"--{boundary}--\r\n".encode("ascii"))
+    return b"".join(parts), f"multipart/mixed; boundary={boundary}"
@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+logger = logging.getLogger("kodiac_v1")
+
+class EncodedFrameCache:
+    """
+    Byte-budgeted LRU of encoded frame payloads.
+
+    Values are immutable bytes so a cached frame can be served to several
+    requests at once; the least recently used entries are dropped once the
+    total payload size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes):
+        size = len(value)
+        if size > self.max_bytes:
+            logger.debug(f"Frame of {size} bytes exceeds cache budget, not cached")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def discard(self, predicate):
+        """Drop every entry whose key satisfies predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._entries if predicate(k)]:
+                self.current_bytes -= len(self._entries.pop(key))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,209 @@
+import io
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image, features
+
+logger = logging.getLogger("kodiac_v1")
+
+# PIL releases the GIL while libjpeg compresses, so a thread pool scales frame encoding across cores
+FRAME_ENCODE_WORKERS = int(os.getenv("FRAME_ENCODE_WORKERS", min(8, os.cpu_count() or 1)))
+JPEG_QUALITY = 95
+# Low-resolution previews for thumbnails and fast scrubbing
+PREVIEW_MAX_SIDE = int(os.getenv("PREVIEW_MAX_SIDE", 256))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", 70))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FRAME_ENCODE_WORKERS, thread_name_prefix="frame-encode")
+        return _pool
+
+def encode_frame(pixels: np.ndarray, frame: int = 0, quality: int = JPEG_QUALITY) -> io.BytesIO:
+    """Encode one frame of a 2D or 3D uint8 pixel array as JPEG."""
+    if len(pixels.shape) == 3:
+        pixels = pixels[frame]
+    img_byte_arr = io.BytesIO()
+    Image.fromarray(pixels).save(img_byte_arr, format='JPEG', quality=quality)
+    img_byte_arr.seek(0)
+    return img_byte_arr
+
+FrameFormat = namedtuple("FrameFormat", ["name", "media_type", "pil_format", "lossy", "options"])
+
+# Formats frames can be served in, in order of server preference. Frames are
+# stored as baseline JPEG; other formats are encoded from the frame's pixels
+# where those are at hand (encode_pixels), else re-encoded from the stored frame.
+FRAME_FORMATS = {}
+
+def register_frame_format(name: str, media_type: str, pil_format: str, lossy: bool = True, **options):
+    """Make a format available to the frame endpoints (fmt=name, or by media type in Accept)."""
+    FRAME_FORMATS[name] = FrameFormat(name, media_type, pil_format, lossy, options)
+
+register_frame_format("jpeg", "image/jpeg", "JPEG")
+register_frame_format("pjpeg", "image/jpeg", "JPEG", progressive=True, optimize=True)
+WEBP_AVAILABLE = features.check("webp")
+if WEBP_AVAILABLE:
+    register_frame_format("webp", "image/webp", "WEBP", method=4)
+register_frame_format("png", "image/png", "PNG", lossy=False, compress_level=6)
+
+def _accept_ranges(accept: str) -> list:
+    ranges = []
+    for item in accept.split(","):
+        fields = [f.strip() for f in item.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for field in fields[1:]:
+            if field.startswith("q="):
+                try:
+                    q = float(field[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((fields[0].lower(), q))
+    return ranges
+
+def negotiate_format(accept: Optional[str], default: str = "jpeg") -> str:
+    """
+    Pick a frame format for an Accept header.
+
+    The highest q wins; between equal q values a media type named exactly
+    beats image/* which beats */*, then server preference decides. Formats
+    sharing a media type (pjpeg) are only chosen by name.
+    """
+    if not accept:
+        return default
+    ranges = _accept_ranges(accept)
+    best, best_rank = None, None
+    media_types = set()
+    for position, fmt in enumerate(FRAME_FORMATS.values()):
+        if fmt.media_type in media_types:
+            continue
+        media_types.add(fmt.media_type)
+        major = fmt.media_type.split("/")[0]
+        match = None
+        for media_range, q in ranges:
+            specificity = 2 if media_range == fmt.media_type else 1 if media_range == f"{major}/*" else \
+                0 if media_range == "*/*" else None
+            if specificity is not None and (match is None or specificity > match[1]):
+                match = (q, specificity)
+        if match is None or match[0] <= 0:
+            continue
+        rank = (match[0], match[1], -position)
+        if best_rank is None or rank > best_rank:
+            best, best_rank = fmt.name, rank
+    return best or default
+
+def encode_variant(encoded: bytes, fmt: str = "jpeg", quality: Optional[int] = None,
+                   max_side: Optional[int] = None) -> bytes:
+    """
+    Re-encode a stored frame in another format and/or quality, optionally
+    downscaled so its long side is at most max_side.
+
+    JPEG input is decoded at reduced scale (draft mode) when downscaling, so
+    only a fraction of the full-size DCT work is done.
+    """
+    img = Image.open(io.BytesIO(encoded))
+    if max_side and img.format == "JPEG":
+        img.draft(img.mode, (max_side, max_side))
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("L")
+    return _save_image(img, fmt, quality, max_side)
+
+def encode_pixels(pixels: np.ndarray, fmt: str = "jpeg", quality: Optional[int] = None,
+                  max_side: Optional[int] = None) -> bytes:
+    """
+    Encode a uint8 frame (rows, cols) or (rows, cols, 3) straight into a
+    frame format - lossless formats stay lossless, lossy ones are a single
+    generation - optionally downscaled so its long side is at most max_side.
+    """
+    return _save_image(Image.fromarray(pixels), fmt, quality, max_side)
+
+def _save_image(img: Image.Image, fmt: str, quality: Optional[int], max_side: Optional[int]) -> bytes:
+    spec = FRAME_FORMATS[fmt]
+    if max_side:
+        img.thumbnail((max_side, max_side))
+    options = dict(spec.options)
+    if spec.lossy:
+        options["quality"] = quality or (PREVIEW_QUALITY if max_side else JPEG_QUALITY)
+    out = io.BytesIO()
+    img.save(out, format=spec.pil_format, **options)
+    return out.getvalue()
+
+def priority_order(number_of_frames: int, start: Optional[int] = None) -> list:
+    """
+    Frame indices starting at the middle frame (or start) and fanning outward.
+
+    For 5 frames this gives [2, 3, 1, 4, 0].
+    """
+    if number_of_frames <= 0:
+        return []
+    start = number_of_frames // 2 if start is None else start
+    order = [start]
+    for offset in range(1, number_of_frames):
+        for frame in (start + offset, start - offset):
+            if 0 <= frame < number_of_frames:
+                order.append(frame)
+    return order
+
+def encode_frames(pixels: np.ndarray, number_of_frames: int, quality: int = JPEG_QUALITY, workers: int = None,
+                  order: Optional[list] = None, on_frame: Optional[Callable] = None) -> list:
+    """
+    Encode frames 0..number_of_frames-1 as JPEG using a thread pool.
+
+    Args:
+        pixels: uint8 pixel array, 2D for a single frame or 3D (frames, rows, cols)
+        number_of_frames: Number of frames to encode
+        quality: JPEG quality
+        workers: Worker count override; 1 encodes serially in the calling thread
+        order: Order in which frames are submitted for encoding (default 0..n-1)
+        on_frame: Called as on_frame(frame, buffer) in the calling thread as
+            soon as each frame is encoded, so frames can be published early
+
+    Returns:
+        List of BytesIO buffers in frame order. A failing frame is logged and
+        its exception re-raised.
+    """
+    workers = FRAME_ENCODE_WORKERS if workers is None else workers
+    order = list(range(number_of_frames)) if order is None else list(order)
+    encoded = [None] * number_of_frames
+
+    if workers <= 1 or number_of_frames <= 1:
+        for frame in order:
+            try:
+                encoded[frame] = encode_frame(pixels, frame, quality)
+            except Exception as e:
+                logger.error(f"Failed to process frame {frame}: {str(e)}")
+                raise
+            if on_frame is not None:
+                on_frame(frame, encoded[frame])
+        return encoded
+
+    pool = _get_pool() if workers == FRAME_ENCODE_WORKERS else ThreadPoolExecutor(max_workers=workers)
+    # The pool works through its queue in submission order, so order sets the encoding priority
+    futures = {pool.submit(encode_frame, pixels, frame, quality): frame for frame in order}
+    try:
+        for future in as_completed(futures):
+            frame = futures[future]
+            try:
+                encoded[frame] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to process frame {frame}: {str(e)}")
+                raise
+            if on_frame is not None:
+                on_frame(frame, encoded[frame])
+        logger.debug(f"Encoded {number_of_frames} frames with {workers} worker(s)")
+        return encoded
+    finally:
+        for future in futures:
+            future.cancel()
+        if pool is not _pool:
+            pool.shutdown(wait=False)
@@ -0,0 +1,58 @@
+import hashlib
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def strong_etag(*parts) -> str:
+    """
+    Strong ETag for a response derived from content: the parts must pin the
+    bytes exactly (source fingerprint, what was derived from it, parameters,
+    algorithm version).
+    """
+    canonical = json.dumps(parts, separators=(",", ":"), default=str)
+    return '"' + hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest() + '"'
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def is_not_modified(headers, etag: str, last_modified: Optional[float] = None) -> bool:
+    """
+    Whether a GET carrying these request headers can be answered with 304.
+
+    If-None-Match is checked first and, when present, If-Modified-Since is
+    ignored (RFC 9110, 13.2.2).
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return int(last_modified) <= since
+
+def cache_headers(etag: str, last_modified: Optional[float] = None, cache_control: str = IMMUTABLE) -> dict:
+    """Validator and caching headers sent with both 200 and 304 responses."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
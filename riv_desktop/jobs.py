@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger("kodiac_v1")
+
+# How long a finished job waits for its last events before completing anyway
+EVENT_GRACE_SECONDS = 5.0
+
+# Set inside pool workers by _init_worker; None in the API process
+_event_queue = None
+_current_job_id = None
+
+class JobQueueFull(RuntimeError):
+    """Raised when the job system already holds the maximum number of pending jobs."""
+
+def _init_worker(event_queue):
+    """Pool initializer: remember the queue used to report events back to the API process."""
+    global _event_queue
+    _event_queue = event_queue
+
+def _run_job(job_id: str, fn: Callable, args: tuple, kwargs: dict):
+    """Executed in a pool worker: run a job function with its job ID set for event reporting."""
+    global _current_job_id
+    _current_job_id = job_id
+    emit("started")
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # Sent after every other event of the job, see JobManager.submit
+        emit("finished")
+        _current_job_id = None
+
+def emit(event: str, **payload):
+    """
+    Report an event for the job currently running in this worker.
+
+    Outside a pool worker (e.g. when a processing function is called directly
+    in the API process) this is a no-op. Returns whether the event was sent.
+    """
+    if _event_queue is None or _current_job_id is None:
+        return False
+    try:
+        _event_queue.put((_current_job_id, event, payload))
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to report job event {event}: {str(e)}")
+        return False
+
+class JobManager:
+    """
+    Bounded process-pool job system.
+
+    Jobs are plain picklable functions executed in a ProcessPoolExecutor. Each
+    job gets an ID and a status record that can be polled while it runs; workers
+    report progress through a queue that is drained by a thread in the API
+    process and dispatched to registered event handlers. A job completes only
+    once its result is back and all of its events have been dispatched, so
+    results need not repeat what the events already delivered.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64, job_ttl: int = 3600,
+                 on_change: Optional[Callable] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.on_change = on_change
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self._futures = {}
+        self._completions = {}
+        self._handlers = {}
+        self._executor = None
+        self._event_queue = None
+        self._drain_thread = None
+        self._lock = threading.Lock()
+
+    def _changed(self, record: dict):
+        """Report a status change of a job to on_change(record), e.g. to share it between workers."""
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(record)
+        except Exception as e:
+            logger.warning(f"Failed to publish job {record['job_id']}: {str(e)}")
+
+    def on_event(self, event: str, handler: Callable):
+        """Register handler(record, payload) for events emitted by running jobs."""
+        self._handlers.setdefault(event, []).append(handler)
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # spawn keeps workers independent of the API process' threads and memory
+            ctx = multiprocessing.get_context("spawn")
+            self._event_queue = ctx.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._event_queue,)
+            )
+            self._drain_thread = threading.Thread(target=self._drain_events, name="job-events", daemon=True)
+            self._drain_thread.start()
+            logger.info(f"Started ingest process pool with {self.max_workers} worker(s)")
+        return self._executor
+
+    def _drain_events(self):
+        """Dispatch events reported by workers until the pool shuts down."""
+        while True:
+            try:
+                item = self._event_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, event, payload = item
+            record = self.jobs.get(job_id)
+            if record is None:
+                continue
+            if event == "started" and record["status"] == "queued":
+                record["status"] = "running"
+                record["started_at"] = time.time()
+                self._changed(record)
+            elif event == "progress":
+                record["progress"].update(payload)
+            elif event == "finished":
+                self._events_done(job_id)
+                continue
+            for handler in self._handlers.get(event, []):
+                try:
+                    handler(record, payload)
+                except Exception as e:
+                    logger.error(f"Job event handler for {event} failed: {str(e)}", exc_info=True)
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id, record in list(self.jobs.items()):
+            if record["status"] in ("done", "error") and record["finished_at"] < cutoff:
+                self.jobs.pop(job_id, None)
+                self._futures.pop(job_id, None)
+
+    def pending_count(self) -> int:
+        return sum(1 for r in self.jobs.values() if r["status"] in ("queued", "running"))
+
+    def submit(self, fn: Callable, *args, on_done: Optional[Callable] = None, meta: Optional[dict] = None, **kwargs) -> str:
+        """
+        Submit fn(*args, **kwargs) to the process pool and return its job ID.
+
+        on_done(record, result) is called in the API process once the job has
+        returned and before it is reported as finished; its return value is
+        stored as the job result and it may set record["error"] to fail the job.
+        """
+        with self._lock:
+            self._prune()
+            if self.pending_count() >= self.max_pending:
+                raise JobQueueFull(f"Too many pending jobs ({self.max_pending})")
+
+            job_id = str(uuid.uuid4())
+            record = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": {},
+                "meta": meta or {},
+                "result": None,
+                "error": None
+            }
+            self.jobs[job_id] = record
+            future = self._ensure_executor().submit(_run_job, job_id, fn, args, kwargs)
+            # Resolved once the record is final; registered under the lock so
+            # the drain thread cannot see the job's last event before it exists
+            finished = Future()
+            self._futures[job_id] = finished
+            completion = {"future": None, "events_done": False,
+                          "finish": lambda fut: self._finish(record, fut, on_done, finished)}
+            self._completions[job_id] = completion
+        self._changed(record)
+
+        def _result_ready(fut):
+            # The result and the job's events travel separately; the job is
+            # finished by whichever of the two arrives last
+            with self._lock:
+                completion["future"] = fut
+                crashed = fut.cancelled() or fut.exception() is not None
+                ready = completion["events_done"] or crashed
+            if ready:
+                self._complete(job_id)
+            else:
+                timer = threading.Timer(EVENT_GRACE_SECONDS, self._complete, (job_id,))
+                timer.daemon = True
+                timer.start()
+
+        future.add_done_callback(_result_ready)
+        return job_id
+
+    def _events_done(self, job_id: str):
+        """The drain thread has dispatched the last event of a job."""
+        with self._lock:
+            completion = self._completions.get(job_id)
+            if completion is None:
+                return
+            completion["events_done"] = True
+            ready = completion["future"] is not None
+        if ready:
+            self._complete(job_id)
+
+    def _complete(self, job_id: str):
+        """Finish a job exactly once, from its result."""
+        with self._lock:
+            completion = self._completions.pop(job_id, None)
+        if completion is None:
+            return
+        completion["finish"](completion["future"])
+
+    def _finish(self, record: dict, fut, on_done: Optional[Callable], finished: Future):
+        try:
+            result = fut.result()
+            record["result"] = on_done(record, result) if on_done is not None else result
+            record["status"] = "error" if record["error"] is not None else "done"
+        except Exception as e:
+            logger.error(f"Job {record['job_id']} failed: {str(e)}")
+            record["error"] = str(e)
+            record["status"] = "error"
+        record["finished_at"] = time.time()
+        self._changed(record)
+        finished.set_result(None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> dict:
+        """Wait for a job to finish without blocking the event loop and return its record."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass
+        return self.jobs[job_id]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._event_queue.put(None)
+            self._executor = None
@@ -1 +1,155 @@
-stored_images = {}
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+
+from riv_desktop.cache_stats import TierStats
+
+logger = logging.getLogger("kodiac_v1")
+
+# How many evicted keys are remembered so they can be reloaded from the disk cache
+MAX_EVICTED_KEYS = 100000
+
+def entry_nbytes(data: dict) -> int:
+    """Approximate memory held by a stored entry: encoded frames, byte buffers, arrays, frame sources and mapped containers."""
+    nbytes = 0
+    for value in data.values():
+        if isinstance(value, io.BytesIO):
+            nbytes += value.getbuffer().nbytes
+        elif isinstance(value, (bytes, bytearray)):
+            nbytes += len(value)
+        elif isinstance(value, np.ndarray):
+            nbytes += value.nbytes
+        elif callable(getattr(value, "nbytes", None)):
+            nbytes += value.nbytes()
+    return nbytes
+
+class MemoryFrameStore(OrderedDict):
+    """
+    In-memory tier of stored entries with a byte budget and LRU eviction.
+
+    Behaves like the plain dict it replaces. Entries are sized when account()
+    is called once they are complete; entries still being ingested are never
+    evicted. When the accounted total exceeds max_bytes, the least recently
+    used entries that can_reload() says the disk cache can restore are
+    dropped; entries it cannot restore are kept even over budget, since
+    dropping them would lose the key for good. The (crc, file_type) of every
+    evicted key is kept so it can be reloaded on its next request.
+
+    Ingest events, the write-behind and warm-up threads change the store
+    while the event loop reads it: every change to the store is made under
+    lock, which callers also hold while filling in an entry from another
+    thread, and loops over the store go through snapshot().
+    """
+
+    def __init__(self, max_bytes: int, can_reload: Optional[Callable] = None):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.can_reload = can_reload
+        self.stats = TierStats()
+        self.evicted = OrderedDict()
+        self._sizes = {}
+        self.lock = threading.RLock()
+
+    @property
+    def current_bytes(self) -> int:
+        with self.lock:
+            return sum(self._sizes.values())
+
+    def snapshot(self) -> list:
+        """(key, entry) pairs at this moment, safe to iterate while other threads change the store."""
+        with self.lock:
+            return list(self.items())
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                self[key] = default
+            return self[key]
+
+    def touch(self, key: Hashable):
+        with self.lock:
+            if key in self:
+                self.move_to_end(key)
+
+    def account(self, key: Hashable):
+        """Size a complete entry, then evict other entries until the store is within budget."""
+        with self.lock:
+            data = self.get(key)
+            if data is None:
+                return
+            nbytes = entry_nbytes(data)
+            self._sizes[key] = nbytes
+            self.stats.set_entry(key, data.get("file_type", "unknown"), nbytes)
+            self.evicted.pop(key, None)
+            self.move_to_end(key)
+            self._evict(keep=key)
+
+    def _evict(self, keep: Hashable):
+        if not self.max_bytes:
+            return
+        total = self.current_bytes
+        if total <= self.max_bytes:
+            return
+
+        candidates = [k for k in self._sizes if k != keep]
+        if self.can_reload is not None:
+            candidates = [k for k in candidates if self.can_reload(k, self[k])]
+
+        for key in candidates:
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes[key]
+            self._drop(key)
+        if total > self.max_bytes:
+            logger.warning(f"Memory store over budget ({total} of {self.max_bytes} bytes): "
+                           f"the remaining entries cannot be restored from disk")
+
+    def _drop(self, key: Hashable):
+        data = super().pop(key)
+        nbytes = self._sizes.pop(key, 0)
+        self.stats.remove_entry(key, evicted=True)
+        crc = data.get("crc")
+        if crc and (self.can_reload is None or self.can_reload(key, data)):
+            self.evicted[key] = (crc, data.get("file_type", "unknown"))
+            while len(self.evicted) > MAX_EVICTED_KEYS:
+                self.evicted.popitem(last=False)
+            logger.info(f"Evicted {key} from memory ({nbytes} bytes), reloadable from disk cache")
+        else:
+            logger.warning(f"Evicted {key} from memory ({nbytes} bytes), not in the disk cache")
+
+    def pop(self, key, *default):
+        with self.lock:
+            if key in self._sizes:
+                self._sizes.pop(key)
+                self.stats.remove_entry(key)
+            return super().pop(key, *default)
+
+    def __delitem__(self, key):
+        with self.lock:
+            if key in self._sizes:
+                self._sizes.pop(key)
+                self.stats.remove_entry(key)
+            super().__delitem__(key)
+
+    def clear(self):
+        with self.lock:
+            super().clear()
+            self._sizes.clear()
+            self.evicted.clear()
+            self.stats.clear()
+
+    def budget(self) -> dict:
+        with self.lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self.current_bytes,
+                "evicted_keys": len(self.evicted)
+            }
@@ -9,6 +9,7 @@ import logging
 import time
 import zlib
 from dotenv import load_dotenv
+from riv_desktop.fingerprint import FINGERPRINT_CHUNK_SIZE, StreamingFingerprint, copy_with_fingerprint, fingerprint_text
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -68,35 +69,34 @@ def save_credentials_to_env(credentials):
         return False
 
 def calculate_s3_object_crc(s3_client, bucket: str, key: str) -> str:
-    """Calculate CRC32 for an S3 object without downloading the entire file."""
+    """Calculate the cache key fingerprint for an S3 object without keeping the entire file in memory."""
     try:
-        # For large files, we'll use the ETag as a proxy for CRC
-        # For small files, we can download and calculate actual CRC
+        # For large files, we'll use the ETag as a proxy for the content
+        # For small files, we stream the object through the fingerprint
         response = s3_client.head_object(Bucket=bucket, Key=key)
         
         # Get file size
         file_size = response.get('ContentLength', 0)
         
-        if file_size < 10 * 1024 * 1024:  # Less than 10MB, calculate actual CRC
+        if file_size < 10 * 1024 * 1024:  # Less than 10MB, fingerprint the content
             obj = s3_client.get_object(Bucket=bucket, Key=key)
-            content = obj['Body'].read()
-            crc = zlib.crc32(content) & 0xFFFFFFFF
-            return format(crc, '08x')
+            fingerprint = StreamingFingerprint()
+            for chunk in obj['Body'].iter_chunks(FINGERPRINT_CHUNK_SIZE):
+                fingerprint.update(chunk)
+            return fingerprint.hexdigest()
         else:
-            # For larger files, use ETag + metadata as CRC proxy
+            # For larger files, use ETag + metadata as content proxy
             etag = response.get('ETag', '').strip('"')
             last_modified = response.get('LastModified', '').isoformat() if response.get('LastModified') else ''
             
-            # Create a composite CRC from metadata
+            # Create a composite fingerprint from metadata
             metadata_str = f"{key}:{etag}:{last_modified}:{file_size}"
-            crc = zlib.crc32(metadata_str.encode('utf-8')) & 0xFFFFFFFF
-            return format(crc, '08x')
+            return fingerprint_text(metadata_str).hexdigest()
             
     except Exception as e:
-        logger.warning(f"Could not calculate CRC for {key}: {str(e)}")
-        # Fallback to path-based CRC
-        crc = zlib.crc32(key.encode('utf-8')) & 0xFFFFFFFF
-        return format(crc, '08x')
+        logger.warning(f"Could not calculate fingerprint for {key}: {str(e)}")
+        # Fallback to path-based fingerprint
+        return fingerprint_text(key).hexdigest()
 
 # Initialize S3 variables
 s3 = None
@@ -245,7 +245,14 @@ async def get_s3_flat_list():
 
 
 @router.get("/api/download_dicom_from_s3")
-async def download_dicom_from_s3(path: str = Query(...)):
+async def download_dicom_from_s3(path: str = Query(...), wait: bool = Query(True)):
+    """
+    Download a file from S3 and ingest it through the process-pool job system.
+
+    With wait=true (default) the response is sent once the job has finished,
+    without blocking the event loop meanwhile. With wait=false the job ID is
+    returned right away and progress can be polled via /api/jobs/{job_id}.
+    """
     global s3, bucket_name
 
     if not s3 or not bucket_name:
@@ -258,42 +265,32 @@ async def download_dicom_from_s3(path: str = Query(...)):
         )
 
     try:
-        from main import process_dicom_file, process_e2e_file, process_fds_file,process_fda_file, stored_images
+        from main import INGEST_JOBS, get_frame_count, get_ingest_handler, submit_ingest_job, stored_images
+        from starlette.concurrency import run_in_threadpool
     except ImportError:
         logger.error("Could not import processing functions from main")
         raise HTTPException(status_code=500, detail="Server configuration error")
 
-    # Generate CRC for this file path and metadata
+    # CRC32 of the object metadata, the key this object was cached under
+    # before content fingerprints
     try:
-        # Get S3 object metadata for CRC calculation
         head_response = s3.head_object(Bucket=bucket_name, Key=path)
         file_size = head_response.get('ContentLength', 0)
         last_modified = head_response.get('LastModified', '').isoformat() if head_response.get('LastModified') else ''
         etag = head_response.get('ETag', '').strip('"')
-        
-        # Calculate CRC based on file metadata
         metadata_str = f"{path}:{etag}:{last_modified}:{file_size}"
-        crc = format(zlib.crc32(metadata_str.encode('utf-8')) & 0xFFFFFFFF, '08x')
-        
-        logger.info(f"Generated CRC for {path}: {crc}")
-        
     except Exception as e:
         logger.warning(f"Could not get S3 metadata for {path}: {str(e)}")
-        # Fallback CRC based on path only
-        crc = format(zlib.crc32(path.encode('utf-8')) & 0xFFFFFFFF, '08x')
-
-    cache_key = path.replace('/', '_').replace('.', '_')
-
-    # Return cached version if present (check both memory and CRC)
-    for key, value in stored_images.items():
-        if isinstance(value, dict) and (
-            value.get("s3_key") == path or 
-            value.get("crc") == crc
-        ):
-            logger.info(f"Cache hit for {path} (CRC: {crc})")
+        metadata_str = path
+    legacy_crc = format(zlib.crc32(metadata_str.encode('utf-8')) & 0xFFFFFFFF, '08x')
+
+    # Return cached version if present in memory
+    for key, value in stored_images.snapshot():
+        if isinstance(value, dict) and value.get("s3_key") == path:
+            logger.info(f"Cache hit for {path}")
             return JSONResponse(content={
                 "message": "File loaded from memory cache.",
-                "number_of_frames": len([k for k in value.keys() if isinstance(k, int)]),
+                "number_of_frames": get_frame_count(value),
                 "dicom_file_path": key,
                 "cache_source": "memory"
             })
@@ -301,20 +298,38 @@ async def download_dicom_from_s3(path: str = Query(...)):
     file_extension = os.path.splitext(path)[1].lower()
     key = str(uuid.uuid4())
 
-    logger.info(f"Downloading {path} from S3 into memory")
-    try:
+    if get_ingest_handler(file_extension) is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
+
+    def _download_to_temp():
+        # The fingerprint is computed while the file is written
         obj = s3.get_object(Bucket=bucket_name, Key=path)
-        file_bytes = obj['Body'].read()  # Read the full content into memory
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
+            fingerprint = copy_with_fingerprint(obj['Body'], tmp)
+            return tmp.name, fingerprint
+
+    logger.info(f"Downloading {path} from S3")
+    try:
+        temp_path, fingerprint = await run_in_threadpool(_download_to_temp)
     except Exception as e:
         logger.error(f"Failed to get S3 object: {str(e)}")
         raise HTTPException(status_code=404, detail=f"Failed to download file: {str(e)}")
 
-    import io
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
-        tmp.write(file_bytes)
-        temp_path = tmp.name
-
     logger.info(f"Downloaded and saved to temp file: {temp_path}")
+    crc = fingerprint.hexdigest()
+    logger.info(f"Fingerprint for {path}: {crc}")
+
+    # The same content may already be loaded under another path
+    for existing_key, value in stored_images.snapshot():
+        if isinstance(value, dict) and value.get("crc") == crc:
+            logger.info(f"Cache hit for {path} (fingerprint: {crc})")
+            os.remove(temp_path)
+            return JSONResponse(content={
+                "message": "File loaded from memory cache.",
+                "number_of_frames": get_frame_count(value),
+                "dicom_file_path": existing_key,
+                "cache_source": "memory"
+            })
 
     stored_images[key] = {
         "local_path": temp_path,
@@ -323,28 +338,30 @@ async def download_dicom_from_s3(path: str = Query(...)):
         "crc": crc
     }
 
-    try:
-        if file_extension in ['.dcm', '.dicom']:
-            return process_dicom_file(temp_path, key, crc)
-        elif file_extension == '.e2e':
-            return process_e2e_file(temp_path, key, crc)
-        elif file_extension in ['.fds']:
-            return process_fds_file(temp_path, key, crc)
-        elif file_extension in ['.fda']:
-            return process_fda_file(temp_path, key, crc)
-        else:
-            os.remove(temp_path)
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
-    except Exception as e:
+    job_id = submit_ingest_job(temp_path, file_extension, key, crc, source=path,
+                               legacy_keys=[fingerprint.legacy_crc(), legacy_crc])
+
+    if not wait:
+        return JSONResponse(status_code=202, content={
+            "message": "File queued for processing.",
+            "job_id": job_id,
+            "dicom_file_path": key,
+            "cache_source": "fresh_download"
+        })
+
+    record = await INGEST_JOBS.wait(job_id)
+    if record["status"] == "error":
         if os.path.exists(temp_path):
             os.remove(temp_path)
-        logger.error(f"Processing error for {path}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+        logger.error(f"Processing error for {path}: {record['error']}")
+        raise HTTPException(status_code=record.get("status_code", 500), detail=record["error"])
+
+    return JSONResponse(content={**record["result"], "job_id": job_id})
 
 # Enhanced endpoint to get S3 object CRC
 @router.get("/api/s3-object-crc")
 async def get_s3_object_crc(path: str = Query(...)):
-    """Get CRC checksum for an S3 object."""
+    """Get the cache key fingerprint for an S3 object."""
     global s3, bucket_name
     
     if not s3 or not bucket_name:
@@ -0,0 +1,100 @@
+import logging
+import zlib
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger("kodiac_v1")
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+
+def little_endian(pixels: np.ndarray) -> np.ndarray:
+    """The array with a little-endian dtype, converted only if it is not already."""
+    dtype = pixels.dtype.newbyteorder("<")
+    return pixels if pixels.dtype == dtype else pixels.astype(dtype)
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Content-Encoding for a volume: zstd if the client takes it (and it is installed), then gzip, else identity."""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        fields = [f.strip() for f in item.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for field in fields[1:]:
+            if field.startswith("q="):
+                try:
+                    q = float(field[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[fields[0].lower()] = q
+    if ZSTD_AVAILABLE and accepted.get("zstd", 0) > 0:
+        return "zstd"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return "identity"
+
+def parse_range(header: Optional[str], total: int) -> Optional[tuple]:
+    """
+    (start, end) inclusive for a single "bytes=" range. None if there is no
+    range or it is not one this endpoint serves (several ranges, other
+    units), in which case the whole volume is sent.
+
+    Raises:
+        ValueError: The range cannot be satisfied
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(0, total - length), total - 1
+        start = int(first)
+        end = int(last) if last else total - 1
+    except ValueError:
+        raise ValueError(f"Invalid range {header}")
+    if start >= total or end < start:
+        raise ValueError(f"Range {header} not satisfiable for {total} bytes")
+    return start, min(end, total - 1)
+
+def iter_volume(get_frame: Callable[[int], np.ndarray], number_of_frames: int, frame_nbytes: int,
+                start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Bytes start..end (inclusive) of the volume, one frame per chunk.
+
+    Frames are fetched with get_frame(i) only when reached, so a decoded
+    source never has to be held in memory whole, and frames entirely outside
+    the range are not touched.
+    """
+    end = number_of_frames * frame_nbytes - 1 if end is None else end
+    for frame in range(start // frame_nbytes, end // frame_nbytes + 1):
+        data = memoryview(little_endian(np.ascontiguousarray(get_frame(frame)))).cast("B")
+        frame_start = frame * frame_nbytes
+        yield bytes(data[max(start - frame_start, 0):min(end - frame_start + 1, frame_nbytes)])
+
+def encode_stream(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a stream of chunks on the fly with the given Content-Encoding."""
+    if encoding == "identity":
+        yield from chunks
+        return
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
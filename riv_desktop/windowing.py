@@ -0,0 +1,93 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("kodiac_v1")
+
+def window_bounds(window_center: float, window_width: float) -> tuple[float, float]:
+    """Convert DICOM WindowCenter/WindowWidth to the (min, max) pixel values of the window."""
+    return window_center - (window_width / 2), window_center + (window_width / 2)
+
+def auto_window_bounds(pixels: np.ndarray) -> tuple[float, float]:
+    """Window spanning the full intensity range of the pixels."""
+    return float(pixels.min()), float(pixels.max())
+
+def _uses_lut(dtype: np.dtype) -> bool:
+    # Unsigned integers up to 16 bits index a lookup table directly
+    return dtype.kind in "ub" and dtype.itemsize <= 2
+
+def _scale_window(values: np.ndarray, min_value: float, max_value: float) -> np.ndarray:
+    """
+    Clip float values to the window and scale them to 0-255 in place.
+
+    The operations and their order are those of the original formula,
+    (clip(v) - min) / (max - min) * 255: folding them into one multiply by
+    255 / (max - min) rounds differently and turns saturated pixels into 254.
+    """
+    np.clip(values, min_value, max_value, out=values)
+    values -= min_value
+    values /= max_value - min_value
+    values *= 255.0
+    return values
+
+@lru_cache(maxsize=64)
+def build_window_lut(min_value: float, max_value: float, dtype=np.uint16) -> np.ndarray:
+    """
+    Build a uint8 lookup table mapping every value of an unsigned integer
+    dtype (65,536 entries for uint16, 256 for uint8) through the window.
+
+    Values go through _scale_window, so every entry is exactly what the
+    per-pixel float formula gives. Tables are cached and returned read-only,
+    since interactive window/level requests reuse the same windows.
+    """
+    size = 1 << (8 * np.dtype(dtype).itemsize)
+    values = np.arange(size, dtype=np.float64)
+    if max_value > min_value:
+        _scale_window(values, min_value, max_value)
+    else:
+        # Degenerate window: everything above the level is white
+        values = np.where(values > min_value, 255.0, 0.0)
+    lut = values.astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+def apply_window(pixels: np.ndarray, min_value: float, max_value: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Map pixels through a window into a uint8 array.
+
+    Unsigned 8/16-bit input goes through a lookup table applied with a single
+    np.take into the preallocated output. Signed and float input falls back to
+    a float path that works frame by frame so at most one frame-sized float
+    copy exists at a time.
+    """
+    if out is None:
+        out = np.empty(pixels.shape, dtype=np.uint8)
+
+    if _uses_lut(pixels.dtype):
+        lut = build_window_lut(float(min_value), float(max_value), pixels.dtype)
+        np.take(lut, pixels, out=out, mode="clip")
+        return out
+
+    frames = pixels.reshape((-1,) + pixels.shape[-2:]) if pixels.ndim >= 2 else pixels.reshape(1, -1)
+    out_frames = out.reshape(frames.shape)
+    for i in range(frames.shape[0]):
+        # Float input keeps its precision, integers are scaled in float64
+        tmp = frames[i].astype(np.float64 if frames.dtype.kind != "f" else frames.dtype)
+        if max_value > min_value:
+            _scale_window(tmp, min_value, max_value)
+        else:
+            tmp = np.where(tmp > min_value, 255.0, 0.0)
+        out_frames[i] = tmp
+    return out
+
+def auto_window(pixels: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Normalize pixels to uint8 over their own min/max range (mid-grey if the range is empty)."""
+    min_value, max_value = auto_window_bounds(pixels)
+    if max_value > min_value:
+        return apply_window(pixels, min_value, max_value, out=out)
+    if out is None:
+        out = np.empty(pixels.shape, dtype=np.uint8)
+    out.fill(128)
+    return out
@@ -0,0 +1,20 @@
+from riv_desktop.cache_index import CacheIndex
+
+def test_put_replaces_an_entry_and_keeps_stats(tmp_path):
+    index = CacheIndex(tmp_path)
+    index.put("abc", "dicom", tmp_path / "dicom" / "ab" / "abc.rivc", frame_count=3, size_bytes=100)
+    index.put("abc", "dicom", tmp_path / "dicom" / "ab" / "abc.rivc", frame_count=3, size_bytes=250)
+
+    assert index.lookup("abc")["size_bytes"] == 250
+    assert index.stats()["dicom"]["entries"] == 1
+    assert index.stats()["dicom"]["bytes"] == 250
+
+def test_put_moves_stats_to_the_new_file_type(tmp_path):
+    index = CacheIndex(tmp_path)
+    index.put("abc", "dicom", tmp_path / "abc.rivc", size_bytes=100)
+    index.put("def", "fda", tmp_path / "def.rivc", size_bytes=50)
+    index.put("abc", "fda", tmp_path / "abc.rivc", size_bytes=100)
+
+    stats = index.stats()
+    assert (stats["dicom"]["entries"], stats["dicom"]["bytes"]) == (0, 0)
+    assert (stats["fda"]["entries"], stats["fda"]["bytes"]) == (2, 150)
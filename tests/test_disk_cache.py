@@ -0,0 +1,12 @@
+from riv_desktop.disk_cache import FrameContainer, write_container
+from riv_desktop.memory_cache import entry_nbytes
+
+def test_mapped_container_counts_its_size(tmp_path):
+    path = tmp_path / "entry.rivc"
+    size = write_container(path, {0: b"a" * 5000, 1: b"b" * 3000}, {"crc": "abc"}, source=b"dicom")
+
+    with FrameContainer(path) as container:
+        container.preload()
+        assert container.nbytes() == size == path.stat().st_size
+        assert entry_nbytes({"container": container, "number_of_frames": len(container)}) == size
+        assert container.frame(1) == b"b" * 3000
@@ -0,0 +1,46 @@
+import io
+
+import numpy as np
+from PIL import Image
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.encaps import encapsulate
+
+from riv_desktop.encapsulated import JPEG_BASELINE, EncapsulatedFrameSource
+
+def jpeg_dataset(frames: np.ndarray) -> Dataset:
+    """An 8-bit greyscale JPEG Baseline multi-frame dataset holding frames."""
+    codestreams = []
+    for frame in frames:
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, "JPEG", quality=95)
+        codestreams.append(buf.getvalue())
+    ds = Dataset()
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = JPEG_BASELINE
+    ds.Rows, ds.Columns = frames.shape[1:]
+    ds.NumberOfFrames = len(frames)
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = ds.BitsStored = 8
+    ds.PixelRepresentation = 0
+    ds.PixelData = encapsulate(codestreams, has_bot=True)
+    return ds
+
+def test_value_range_spans_every_frame():
+    # Only the first and last frames reach the extremes, the middle one is flat
+    frames = np.full((3, 32, 32), 120, dtype=np.uint8)
+    frames[0, :16] = 10
+    frames[2, 16:] = 240
+    source = EncapsulatedFrameSource(jpeg_dataset(frames), len(frames))
+
+    decoded = np.stack([source.decode(i) for i in range(len(frames))])
+    assert source.value_range() == (float(decoded.min()), float(decoded.max()))
+    assert source.value_range() != (float(decoded[1].min()), float(decoded[1].max()))
+
+def test_rebuilt_from_header_and_codestreams():
+    frames = np.stack([np.full((16, 16), value, dtype=np.uint8) for value in (30, 200)])
+    source = EncapsulatedFrameSource(jpeg_dataset(frames), len(frames))
+
+    rebuilt = EncapsulatedFrameSource.from_frames(source.header(), [source.raw_frame(i) for i in range(len(frames))])
+    assert rebuilt.number_of_frames == 2 and rebuilt.display_ready
+    assert np.array_equal(rebuilt.decode(1), source.decode(1))
@@ -0,0 +1,57 @@
+import json
+import struct
+import time
+
+import pytest
+
+from riv_desktop.frame_bundle import BUNDLE_MAGIC, pack_bundle, parse_frame_list
+
+def test_list_with_ranges_keeps_order_without_duplicates():
+    assert parse_frame_list("10-12, 4,0,4, 11") == [10, 11, 12, 4, 0]
+
+def test_start_end_inclusive():
+    assert parse_frame_list(start=3, end=6) == [3, 4, 5, 6]
+    assert parse_frame_list(start=3) == [3]
+    assert parse_frame_list() == []
+
+@pytest.mark.parametrize("frames", ["a", "1-b", "-5", "3-"])
+def test_malformed_list(frames):
+    with pytest.raises(ValueError):
+        parse_frame_list(frames)
+
+def test_backwards_ranges_are_rejected():
+    with pytest.raises(ValueError):
+        parse_frame_list("5-2")
+    with pytest.raises(ValueError):
+        parse_frame_list(start=5, end=2)
+
+def test_limit_is_inclusive():
+    assert len(parse_frame_list("0-255", limit=256)) == 256
+    assert len(parse_frame_list(start=0, end=255, limit=256)) == 256
+
+@pytest.mark.parametrize("kwargs", [
+    {"frames": "0-256"},
+    {"frames": "0-200,300-400"},
+    {"frames": ",".join(str(i) for i in range(257))},
+    {"start": 0, "end": 256},
+])
+def test_over_limit_is_rejected(kwargs):
+    with pytest.raises(ValueError):
+        parse_frame_list(limit=256, **kwargs)
+
+@pytest.mark.parametrize("kwargs", [{"frames": "0-20000000000"}, {"start": 0, "end": 20000000000}])
+def test_huge_range_is_rejected_without_expanding_it(kwargs):
+    started = time.perf_counter()
+    with pytest.raises(ValueError):
+        parse_frame_list(limit=256, **kwargs)
+    assert time.perf_counter() - started < 0.1
+
+def test_pack_bundle_layout():
+    body = pack_bundle([(2, b"abc", '"e2"'), (0, b"de", None)], "image/jpeg", key="k")
+    magic, version, index_length = struct.unpack_from("<4sHI", body)
+    assert magic == BUNDLE_MAGIC and version == 1
+    header_size = struct.calcsize("<4sHI")
+    index = json.loads(body[header_size:header_size + index_length])
+    payload = body[header_size + index_length:]
+    assert index["key"] == "k" and index["media_type"] == "image/jpeg"
+    assert [(f["frame"], payload[f["offset"]:f["offset"] + f["length"]]) for f in index["frames"]] == [(2, b"abc"), (0, b"de")]
@@ -0,0 +1,29 @@
+import io
+
+from riv_desktop.memory_cache import MemoryFrameStore
+
+def entry(crc: str, nbytes: int, reloadable: bool) -> dict:
+    return {0: io.BytesIO(b"x" * nbytes), "crc": crc, "reloadable": reloadable}
+
+def store(max_bytes: int) -> MemoryFrameStore:
+    return MemoryFrameStore(max_bytes, can_reload=lambda key, data: data["reloadable"])
+
+def test_evicts_only_reloadable_entries():
+    images = store(250)
+    for key, reloadable in (("a", False), ("b", True), ("c", True)):
+        images[key] = entry(key, 100, reloadable)
+        images.account(key)
+
+    # "a" is the least recently used, but only the disk cache could bring it back
+    assert list(images) == ["a", "c"]
+    assert "b" in images.evicted and "a" not in images.evicted
+
+def test_stays_over_budget_rather_than_losing_entries():
+    images = store(150)
+    for key in ("a", "b"):
+        images[key] = entry(key, 100, reloadable=False)
+        images.account(key)
+
+    assert list(images) == ["a", "b"]
+    assert images.current_bytes == 200
+    assert not images.evicted
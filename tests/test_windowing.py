@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from riv_desktop.windowing import apply_window, build_window_lut, window_bounds
+
+def reference_window(pixels: np.ndarray, min_value: float, max_value: float) -> np.ndarray:
+    """The float formula apply_windowing used before the lookup table."""
+    pixels = np.clip(pixels, min_value, max_value)
+    pixels = (pixels - min_value) / (max_value - min_value)
+    return (pixels * 255.0).astype(np.uint8)
+
+WINDOWS = [(wc, ww) for wc in range(-50, 4200, 137) for ww in (1, 2, 7, 33, 123, 255, 256, 1000, 4095, 65535)]
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+def test_lut_matches_float_formula(dtype):
+    values = np.arange(np.iinfo(dtype).max + 1, dtype=dtype)
+    for wc, ww in WINDOWS + [(300, 123), (127.5, 255.0), (2047.5, 4095.0)]:
+        min_value, max_value = window_bounds(wc, ww)
+        np.testing.assert_array_equal(
+            build_window_lut(min_value, max_value, dtype), reference_window(values, min_value, max_value),
+            err_msg=f"WC={wc} WW={ww}"
+        )
+
+def test_saturated_pixels_are_white():
+    min_value, max_value = window_bounds(300, 123)
+    pixels = np.array([[0, 238, 361, 362, 65535]], dtype=np.uint16)
+    assert apply_window(pixels, min_value, max_value).tolist() == [[0, 0, 253, 255, 255]]
+
+@pytest.mark.parametrize("dtype", [np.int16, np.float32])
+def test_float_path_matches_float_formula(dtype):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(-1024, 4096, size=(3, 16, 16)).astype(dtype)
+    for wc, ww in WINDOWS:
+        min_value, max_value = window_bounds(wc, ww)
+        np.testing.assert_array_equal(
+            apply_window(pixels, min_value, max_value), reference_window(pixels, min_value, max_value),
+            err_msg=f"WC={wc} WW={ww}"
+        )
+
+def test_lut_is_read_only_and_cached():
+    lut = build_window_lut(100.0, 200.0, np.uint16)
+    assert lut is build_window_lut(100.0, 200.0, np.uint16)
+    assert not lut.flags.writeable